@@ -0,0 +1,173 @@
+"""asyncio front-end to acky (Python 3.5+)
+
+AsyncAWS mirrors acky.aws.AWS: services and collections are reached the
+same way, but their methods are coroutines. Each call runs the blocking
+acky method on a thread pool, and a semaphore per service bounds how many
+calls to that service are in flight at once::
+
+    aws = AsyncAWS('us-east-1', concurrency={'sqs': 50})
+    messages = await aws.sqs.Messages.get('jobs')
+    await asyncio.gather(*(aws.s3.download(url, path)
+                           for url, path in files))
+
+Cancelling a task waiting on a call releases its semaphore slot at once;
+a call that has not started yet is never sent, while one already running
+on a worker thread finishes there and its result is discarded.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from acky.api import AwsApiClient
+
+DEFAULT_CONCURRENCY = 10
+SERVICES = ('ec2', 'iam', 'rds', 'sqs', 'sts', 's3')
+
+
+class AsyncAWS(object):
+    def __init__(self, region=None, profile=None, concurrency=None,
+                 max_workers=None, aws=None, **options):
+        """Wrap a new AWS(region, profile, **options), or an existing AWS
+        object passed as aws. concurrency is either a number applied to
+        every service or a dict of limits by service name.
+
+        The thread pool has max_workers threads, by default the sum of the
+        services' limits, so that every service can reach its limit at
+        once. A smaller max_workers caps the calls in flight across all
+        services."""
+        if aws is None:
+            from acky.aws import AWS
+            aws = AWS(region, profile, **options)
+        self.aws = aws
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        if max_workers is None:
+            services = set(SERVICES)
+            if isinstance(self.concurrency, dict):
+                services.update(self.concurrency)
+            max_workers = sum(self._limit(name) for name in services)
+        elif max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._semaphores = {}
+
+    @property
+    def region(self):
+        return self.aws.region
+
+    def _limit(self, service_name):
+        limit = self.concurrency
+        if isinstance(limit, dict):
+            limit = limit.get(service_name, DEFAULT_CONCURRENCY)
+        return limit
+
+    def _semaphore(self, service_name):
+        semaphore = self._semaphores.get(service_name)
+        if semaphore is None:
+            semaphore = self._semaphores[service_name] = \
+                asyncio.Semaphore(self._limit(service_name))
+        return semaphore
+
+    async def run(self, service_name, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the thread pool, within the service's
+        concurrency limit."""
+        loop = asyncio.get_event_loop()
+        async with self._semaphore(service_name):
+            return await loop.run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def userinfo(self):
+        return await self.run('iam', lambda: self.aws.userinfo)
+
+    async def username(self):
+        return (await self.userinfo())['UserName']
+
+    async def account_id(self):
+        return (await self.userinfo())['Arn'].split(":")[4]
+
+    async def environment(self):
+        return await self.run('iam', lambda: self.aws.environment)
+
+    @property
+    def ec2(self):
+        return AsyncClient(self, self.aws.ec2)
+
+    @property
+    def iam(self):
+        return AsyncClient(self, self.aws.iam)
+
+    @property
+    def rds(self):
+        return AsyncClient(self, self.aws.rds)
+
+    @property
+    def sqs(self):
+        return AsyncClient(self, self.aws.sqs)
+
+    @property
+    def sts(self):
+        return AsyncClient(self, self.aws.sts)
+
+    @property
+    def s3(self):
+        return AsyncClient(self, self.aws.s3)
+
+
+class AsyncClient(object):
+    """Awaitable view of an AwsApiClient. Collections are returned as
+    AsyncClients, methods as coroutine functions. Methods that return
+    iterators (e.g. get(stream=True)) give an AsyncIterator."""
+    def __init__(self, aws, client):
+        self._aws = aws
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if isinstance(attr, AwsApiClient):
+            return AsyncClient(self._aws, attr)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            result = await self._aws.run(self._client.service_name, attr,
+                                         *args, **kwargs)
+            if hasattr(result, '__next__'):
+                return AsyncIterator(self._aws, self._client.service_name,
+                                     result)
+            return result
+        return method
+
+
+class AsyncIterator(object):
+    """Drains a blocking iterator on the thread pool, `chunk_size` items
+    per hop, for use with `async for`."""
+    def __init__(self, aws, service_name, iterator, chunk_size=100):
+        self._aws = aws
+        self._service_name = service_name
+        self._iterator = iterator
+        self._chunk_size = chunk_size
+        self._buffer = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._buffer:
+            self._buffer = await self._aws.run(
+                self._service_name,
+                lambda: list(islice(self._iterator, self._chunk_size)))
+            self._buffer.reverse()
+        if not self._buffer:
+            raise StopAsyncIteration
+        return self._buffer.pop()
@@ -1,5 +1,11 @@
 import logging
-from xml.dom.minidom import parseString
+import threading
+import time
+from acky.cache import is_read_only, is_shareable, request_key
+from acky.retry import THROTTLE
+from xml.parsers import expat
+
+log = logging.getLogger(__name__)
 
 
 def make_filters(data, key_name='Name', values_name='Values'):
@@ -19,43 +25,165 @@ def make_map(data, key_name='Name', value_name='Value'):
     return value_map
 
 
+def make_projection(fields):
+    """Return a function that copies only the given fields out of a result
+    item. Fields are dotted paths such as 'State.Name'; a path through a
+    list applies to each of its elements, and the copy keeps the item's
+    shape, so e.g. ['InstanceId', 'State.Name'] gives
+    {'InstanceId': 'i-...', 'State': {'Name': 'running'}}."""
+    if isinstance(fields, str):
+        fields = [fields]
+    tree = {}
+    for field in fields:
+        node = tree
+        parts = field.split('.')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if node is None:
+                # An earlier field keeps all of this one.
+                break
+        else:
+            node[parts[-1]] = None
+    return lambda item: _project(item, tree)
+
+
+def _project(value, tree):
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_project(v, tree) for v in value]
+    if not isinstance(value, dict):
+        return value
+    return dict((key, _project(value[key], subtree))
+                for key, subtree in tree.items() if key in value)
+
+
 class AWSErrorNotFound(Exception):
     pass
 
 
+class _ErrorFound(Exception):
+    pass
+
+
 def extract_aws_error(xml_string):
+    """Return (code, message) from the first Error element of an AWS error
+    response that has both a Code and a Message child. The body is parsed
+    as a stream and parsing stops as soon as they are found."""
     def _bomb(xml_string):
         e = AWSErrorNotFound("The string provided does not appear to be an "
                              "XML AWS error response")
         e.xml_string = xml_string
         raise e
 
-    try:
-        dom = parseString(xml_string)
-    except TypeError:
-        _bomb(xml_string)
-
-    for tag in dom.getElementsByTagName('Error'):
-        children = [n.tagName for n in tag.childNodes
-                    if n.nodeType != n.TEXT_NODE]
-        if 'Code' in children and 'Message' in children:
-            code = tag.getElementsByTagName('Code')[0].firstChild.data
-            message = tag.getElementsByTagName('Message')[0].firstChild.data
-            return code, message
+    # For each open Error element: [depth, {child tag: text}]
+    errors = []
+    depth = [0]
+    text = []
+
+    def start(name, attrs):
+        depth[0] += 1
+        if name == 'Error':
+            errors.append([depth[0], {}])
+        del text[:]
 
+    def end(name):
+        if errors:
+            error_depth, children = errors[-1]
+            if name == 'Error' and depth[0] == error_depth:
+                errors.pop()
+                if 'Code' in children and 'Message' in children:
+                    raise _ErrorFound(children['Code'], children['Message'])
+            elif depth[0] == error_depth + 1 and name in ('Code', 'Message'):
+                children.setdefault(name, ''.join(text))
+        del text[:]
+        depth[0] -= 1
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text.append
+    try:
+        parser.Parse(xml_string, True)
+    except _ErrorFound as found:
+        return found.args
+    except (TypeError, expat.ExpatError):
+        pass
     _bomb(xml_string)
 
 
+def _listify(value):
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _next_tokens(paging, data):
+    """Return the request parameters for the page after data, or None."""
+    if not paging:
+        return None
+    import jmespath
+    if 'more_results' in paging and \
+       not jmespath.search(paging['more_results'], data):
+        return None
+    names = _listify(paging['py_input_token'])
+    values = [jmespath.search(expr, data)
+              for expr in _listify(paging['output_token'])]
+    if all(value is None for value in values):
+        return None
+    return dict(zip(names, values))
+
+
+def _message_sizes(response, streaming=False):
+    """Return (request bytes, response bytes) of an HTTP exchange, without
+    reading a streaming response body."""
+    sent = 0
+    request = getattr(response, 'request', None)
+    if request is not None:
+        length = request.headers.get('Content-Length')
+        if length is not None:
+            sent = int(length)
+        elif isinstance(request.body, (bytes, str)):
+            sent = len(request.body)
+    length = response.headers.get('Content-Length')
+    if length is not None:
+        received = int(length)
+    elif streaming:
+        received = 0
+    else:
+        received = len(response.content or b'')
+    return sent, received
+
+
 class AWSServiceUnavailable(Exception):
     pass
 
 
 class AWSCallError(Exception):
+    """A failed API call. The AWS error code and message are parsed from the
+    response body the first time they are used; both are None if the body
+    holds no AWS error."""
     def __init__(self, response, operation):
         self.response = response
         self.operation = operation
         self.args = (response, operation)
-        self.code, self.message = extract_aws_error(response.text)
+        self._error = None
+
+    def _parse(self):
+        if self._error is None:
+            try:
+                self._error = extract_aws_error(self.response.text)
+            except AWSErrorNotFound:
+                self._error = (None, None)
+        return self._error
+
+    @property
+    def code(self):
+        return self._parse()[0]
+
+    @property
+    def message(self):
+        return self._parse()[1]
 
     def __str__(self):
         return "{}: {}: {}".format(self.operation,
@@ -63,21 +191,156 @@ class AWSCallError(Exception):
                                    self.message)
 
 
+class ServiceCache(object):
+    """Per-(service, region) cache of botocore Service and Endpoint objects.
+
+    Loading a service model and building an endpoint are expensive, so every
+    client built from the same AWS object shares the objects held here.
+    Call invalidate() to drop cached objects, e.g. after credentials change.
+    New endpoints get http_config's connection pool settings, if given.
+    """
+    def __init__(self, session, http_config=None):
+        self.session = session
+        self.http_config = http_config
+        self._services = {}
+        self._endpoints = {}
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def get_service(self, service_name):
+        service = self._services.get(service_name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(service_name)
+                if service is None:
+                    service = self.session.get_service(service_name)
+                    self._services[service_name] = service
+        return service
+
+    def get_endpoint(self, service_name, region):
+        key = (service_name, region)
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            service = self.get_service(service_name)
+            with self._lock:
+                endpoint = self._endpoints.get(key)
+                if endpoint is None:
+                    endpoint = service.get_endpoint(region)
+                    if self.http_config is not None:
+                        self.http_config.apply(endpoint)
+                    self._endpoints[key] = endpoint
+        return endpoint
+
+    def get_operation(self, service_name, operation):
+        """Return a service's Operation object, creating it (and its
+        parameter objects, which botocore builds lazily) only once."""
+        operations = self.get_operations(service_name)
+        op = operations.get(operation)
+        if op is None:
+            service = self.get_service(service_name)
+            with self._lock:
+                op = operations.get(operation)
+                if op is None:
+                    op = service.get_operation(operation)
+                    if op is not None:
+                        # Build the parameter objects before other threads
+                        # can see the operation.
+                        op.params
+                        operations[operation] = op
+        return op
+
+    def get_operations(self, service_name):
+        """Return the dict used to cache Operation objects by name for a
+        service. Clients fill it as they look operations up."""
+        operations = self._operations.get(service_name)
+        if operations is None:
+            operations = self._operations.setdefault(service_name, {})
+        return operations
+
+    def invalidate(self, service_name=None, region=None):
+        """Drop cached objects. With no arguments everything is dropped;
+        otherwise only entries matching service_name and/or region."""
+        with self._lock:
+            for key in list(self._endpoints):
+                if service_name not in (None, key[0]):
+                    continue
+                if region not in (None, key[1]):
+                    continue
+                del self._endpoints[key]
+            if region is None:
+                if service_name is None:
+                    self._services.clear()
+                    self._operations.clear()
+                else:
+                    self._services.pop(service_name, None)
+                    self._operations.pop(service_name, None)
+
+
 class AwsApiClient(object):
     service_name = None
 
     def __init__(self, aws):
         self._aws = aws
-        self._service = aws.session.get_service(self.service_name)
-        self._endpoint = self._service.get_endpoint(aws.region)
+        services = getattr(aws, 'services', None)
+        if services is None:
+            services = ServiceCache(aws.session)
+        self._services = services
+        self._service = services.get_service(self.service_name)
+        self._endpoint = services.get_endpoint(self.service_name, aws.region)
+        self._operations = services.get_operations(self.service_name)
+        self._region = aws.region
+        self._cache = getattr(aws, 'response_cache', None)
+        self._flights = getattr(aws, 'single_flight', None)
+        self._limiter = getattr(aws, 'rate_limiter', None)
+        self._stats = getattr(aws, 'stats', None)
+        self._tracer = getattr(aws, 'tracer', None)
+        self._retry_policy = getattr(aws, 'retry_policy', None)
+        self._rate = None
+        if self._retry_policy is not None:
+            self._rate = self._retry_policy.rate(self.service_name,
+                                                 aws.region)
+
+    def _get_operation(self, operation):
+        op = self._operations.get(operation)
+        if op is None:
+            op = self._services.get_operation(self.service_name, operation)
+        return op
 
     def call(self, operation, response_data_key=None, *args, **kwargs):
-        log = logging.getLogger(__name__)
-        op = self._service.get_operation(operation)
-        log.debug("Calling {} action '{}'".format(self._service, operation))
-        resp, data = op.call(self._endpoint, *args, **kwargs)
-        if not resp.ok:
-            raise AWSCallError(resp, operation)
+        """Call an operation with the given parameters and return the
+        parsed response, or the part of it under response_data_key. Pass
+        cache=False to skip the response cache, e.g. when polling for a
+        change."""
+        use_cache = kwargs.pop('cache', True)
+        tracer = self._tracer
+        if tracer is None or not tracer.active:
+            return self._call(operation, response_data_key, args, kwargs,
+                              use_cache)
+        with tracer.span(operation, self.service_name, kwargs,
+                         region=self._region):
+            return self._call(operation, response_data_key, args, kwargs,
+                              use_cache)
+
+    def _call(self, operation, response_data_key, args, kwargs,
+              use_cache=True):
+        op = self._get_operation(operation)
+        cache = self._cache
+        flights = self._flights
+        if not use_cache and is_read_only(operation):
+            cache = None
+        if not is_read_only(operation):
+            try:
+                data = self._send(op, operation, *args, **kwargs)
+            finally:
+                if cache is not None:
+                    cache.invalidate(self.service_name, self._region)
+                if flights is not None:
+                    flights.invalidate(self.service_name, self._region)
+        elif (cache is None and flights is None) or \
+                not is_shareable(operation, op):
+            data = self._send(op, operation, *args, **kwargs)
+        else:
+            data = self._shared_read(op, operation, args, kwargs, cache)
         if response_data_key:
             if response_data_key in data:
                 return data[response_data_key]
@@ -85,6 +348,161 @@ class AwsApiClient(object):
         else:
             return data
 
+    def _shared_read(self, op, operation, args, kwargs, cache):
+        """Serve a read from the response cache, or join an identical
+        request already in flight, before sending a new one."""
+        if cache is not None and \
+           not cache.cacheable(self.service_name, operation, op):
+            cache = None
+        key = request_key(self.service_name, self._region, operation, kwargs)
+        if cache is not None:
+            data = cache.get(key)
+            if data is not None:
+                if self._tracer is not None:
+                    self._tracer.annotate(cached=True)
+                return data
+
+        def fetch():
+            if cache is not None:
+                generation = cache.generation(self.service_name, self._region)
+            data = self._send(op, operation, *args, **kwargs)
+            if cache is not None:
+                cache.put(key, data, generation)
+            return data
+
+        if self._flights is None:
+            return fetch()
+        return self._flights.do(key, fetch)
+
+    def _send(self, op, operation, *args, **kwargs):
+        """Make the request, retrying throttled and transient failures as
+        the AWS object's retry policy allows. Returns the parsed data."""
+        stats = self._stats
+        if stats is None:
+            return self._send_with_retries(op, operation, None, args, kwargs)
+        sizes = [0, 0]
+        error_code = None
+        start = time.time()
+        try:
+            return self._send_with_retries(op, operation, sizes, args, kwargs)
+        except AWSCallError as e:
+            error_code = e.code or str(e.response.status_code)
+            raise
+        except Exception as e:
+            error_code = type(e).__name__
+            raise
+        finally:
+            stats.record_call(self.service_name, operation,
+                              time.time() - start, error_code, *sizes)
+
+    def _send_with_retries(self, op, operation, sizes, args, kwargs):
+        policy = self._retry_policy
+        limiter = self._limiter
+        rate = self._rate
+        # File-like bodies are rewound before a retry resends them.
+        streams = [(value, value.tell()) for value in kwargs.values()
+                   if hasattr(value, 'seek') and hasattr(value, 'tell')]
+        attempt = 1
+        while True:
+            if limiter is not None:
+                limiter.acquire(self.service_name, operation)
+            sent_at = None
+            if rate is not None:
+                sent_at = rate.acquire()
+            log.debug("Calling %s action '%s'", self._service, operation)
+            try:
+                resp, data = op.call(self._endpoint, *args, **kwargs)
+            except Exception as e:
+                # The request could not be sent or its response read.
+                kind = None
+                if policy is not None:
+                    kind = policy.classify_exception(e)
+                if kind is None or attempt >= policy.max_attempts:
+                    raise
+                code = type(e).__name__
+            else:
+                if sizes is not None:
+                    sent, received = _message_sizes(resp, op.is_streaming())
+                    sizes[0] += sent
+                    sizes[1] += received
+                if resp.ok:
+                    if rate is not None:
+                        rate.succeeded()
+                    return data
+                error = AWSCallError(resp, operation)
+                kind = None
+                if policy is not None:
+                    kind = policy.classify(resp.status_code, error.code)
+                if kind == THROTTLE and rate is not None:
+                    rate.throttled(sent_at)
+                if kind is None or attempt >= policy.max_attempts:
+                    raise error
+                code = error.code
+            delay = policy.delay(attempt)
+            log.debug("Retrying %s action '%s' in %.2fs (%s error)",
+                      self._service, operation, delay, kind)
+            if self._stats is not None:
+                self._stats.record_retry(self.service_name, operation)
+            if self._tracer is not None:
+                self._tracer.event('retry', attempt=attempt, delay=delay,
+                                   code=code)
+            policy.sleep(delay)
+            for stream, position in streams:
+                stream.seek(position)
+            attempt += 1
+
+    def iter_call(self, operation, response_data_key=None, projection=None,
+                  page_size=None, **kwargs):
+        """Call a paginated operation, following its NextToken/Marker tokens,
+        and yield the items under response_data_key one at a time. Only one
+        page is held in memory at once; with a projection function (see
+        make_projection()), each page is projected as it arrives and the
+        full page is dropped before its items are yielded. page_size asks
+        for pages of that many items, where the operation has a limit
+        parameter such as MaxResults. Pages are only requested as the
+        items are consumed, so a caller that stops early saves the rest.
+        Operations without pagination metadata are called once. Other
+        keyword arguments, such as cache, are passed on to call()."""
+        paging = getattr(self._get_operation(operation), 'pagination', None)
+        if response_data_key is None and paging:
+            response_data_key = _listify(paging['result_key'])[0]
+        if page_size and paging and paging.get('limit_key'):
+            kwargs[paging['limit_key']] = page_size
+        previous = None
+        while True:
+            data = self.call(operation, **kwargs)
+            if not data:
+                return
+            items = data.get(response_data_key) or ()
+            tokens = _next_tokens(paging, data)
+            if projection is not None:
+                items = [projection(item) for item in items]
+                data = None
+            for item in items:
+                yield item
+            if not tokens:
+                return
+            if tokens == previous:
+                log.warning("%s returned the same pagination token twice; "
+                            "stopping", operation)
+                return
+            kwargs.update(tokens)
+            previous = tokens
+
+    def batch_loader(self, name, fetch, key, **options):
+        """Return the BatchLoader registered under name on the AWS object,
+        creating it with fetch, key and options if needed, so lookups from
+        every client of that object are batched together."""
+        from acky.loader import BatchLoader
+        loaders = getattr(self._aws, 'loaders', None)
+        if loaders is None:
+            loaders = self.__dict__.setdefault('_loaders', {})
+        loader = loaders.get(name)
+        if loader is None:
+            loader = loaders.setdefault(name,
+                                        BatchLoader(fetch, key, **options))
+        return loader
+
     def regions(self, continent='us', include_gov=False):
         # returns (string, ...)
         regions = self._service.region_names
@@ -1,28 +1,197 @@
-"""Classes to represent an Amazon Web Services connection and its objects"""
+"""Classes to represent an Amazon Web Services connection and its objects
+
+botocore and the service modules are imported on first use, so that
+importing acky stays cheap for tools that only touch one service.
+"""
 from datetime import datetime
-import acky.ec2
-import acky.iam
-import acky.rds
-import acky.sts
-import acky.sqs
-import acky.s3
-import botocore.session
+import threading
+from acky.api import ServiceCache
+from acky.cache import SingleFlight
+from acky.retry import RetryPolicy
+from acky.trace import Tracer
 
 
-class AWS(object):
-    def __init__(self, region, profile=None):
+class RegionResults(dict):
+    """Results of AWS.across_regions() keyed by region. Regions whose call
+    raised are left out and their exceptions kept in the errors dict."""
+    def __init__(self):
+        super(RegionResults, self).__init__()
+        self.errors = {}
+
+
+def _raise_send_error(caught_exception=None, **kwargs):
+    # Stands in for botocore's retry handlers. Without any, botocore drops
+    # an exception raised while sending a request and returns no response.
+    if caught_exception is not None:
+        raise caught_exception
+
+
+class SessionPool(object):
+    """botocore sessions, with their ServiceCaches, by profile and HTTP
+    connection settings.
+
+    A session holds credentials and loaded service models but is not tied to
+    a region, so AWS objects for any number of regions can share one and
+    only load each service model once. Every AWS object shares its pool with
+    its for_region() copies; pass session_pool=True to AWS() to use
+    SESSION_POOL, shared by the whole process, instead.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, profile=None, region=None, http_config=None):
+        """Return (session, services) for a profile, creating the session
+        (with region as its default region) on first use."""
+        key = (profile, http_config)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = \
+                        self._create(profile, region, http_config)
+        return entry
+
+    def _create(self, profile, region, http_config):
         env_vars = {
             'region': ('region', 'BOTO_DEFAULT_REGION', region),
             'profile': (None, 'BOTO_DEFAULT_PROFILE', profile),
         }
-        self.session = botocore.session.get_session(env_vars)
-        self.session.profile = profile
+        import botocore.session
+        from botocore.handlers import register_retries_for_service
+        session = botocore.session.get_session(env_vars)
+        session.profile = profile
+        # acky's RetryPolicy retries calls, so botocore must not retry them
+        # too: its retries would multiply acky's attempts and hide
+        # throttles from the AdaptiveRate.
+        session.unregister('service-created', register_retries_for_service)
+        session.register('needs-retry', _raise_send_error)
+        return session, ServiceCache(session, http_config)
+
+    def clear(self):
+        """Drop every session, e.g. after credentials change."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+SESSION_POOL = SessionPool()
+
+
+class AWS(object):
+    """Connection to AWS in one region. An AWS object, and the clients built
+    from it, may be shared by any number of threads: the objects they share
+    (botocore endpoints, caches, limiters, loaders and the user info) are
+    created once, under locks, and botocore signs requests under a
+    per-endpoint lock while urllib3 hands each thread its own connection
+    from the endpoint's pool."""
+    def __init__(self, region, profile=None, retry_policy=None,
+                 rate_limiter=None, response_cache=None, coalesce=True,
+                 stats=False, session_pool=None, http_config=None):
+        if session_pool is True:
+            session_pool = SESSION_POOL
+        elif session_pool is None:
+            session_pool = SessionPool()
+        self.session_pool = session_pool
+        self.http_config = http_config
+        self.session, self.services = self.session_pool.get(profile, region,
+                                                            http_config)
+        self.profile = profile
         self.region = region
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        # One limiter per region, shared by every for_region() copy.
+        self._region_limiters = {region: rate_limiter}
+        self._region_limiters_lock = threading.Lock()
+        self.response_cache = response_cache
+        self.single_flight = SingleFlight() if coalesce else None
+        self.loaders = {}
+        if stats is True:
+            from acky.stats import StatsRegistry
+            stats = StatsRegistry()
+        self.stats = stats or None
+        self.tracer = Tracer()
+        self._lock = threading.Lock()
+
+    def invalidate(self, service_name=None):
+        """Forget cached service and endpoint objects so the next client
+        built from this object loads them afresh. This affects every AWS
+        object sharing the session."""
+        self.services.invalidate(service_name)
+
+    def trace(self):
+        """Return a context manager that records the calls made through this
+        object (and its for_region() copies) as an acky.trace.Trace."""
+        return self.tracer.trace()
+
+    def for_region(self, region):
+        """Return an AWS object for another region with the same session,
+        connection settings, retry policy, stats registry, tracer and
+        response cache (whose keys include the region).
+        Rate limits are copied, since AWS applies them per region, and
+        every copy for the same region shares one limiter."""
+        rate_limiter = None
+        if self.rate_limiter is not None:
+            with self._region_limiters_lock:
+                rate_limiter = self._region_limiters.get(region)
+                if rate_limiter is None:
+                    rate_limiter = self._region_limiters[region] = \
+                        self.rate_limiter.clone()
+        aws = self.__class__(region, self.profile,
+                             retry_policy=self.retry_policy,
+                             rate_limiter=rate_limiter,
+                             response_cache=self.response_cache,
+                             coalesce=self.single_flight is not None,
+                             stats=self.stats,
+                             session_pool=self.session_pool,
+                             http_config=self.http_config)
+        aws.tracer = self.tracer
+        aws._region_limiters = self._region_limiters
+        aws._region_limiters_lock = self._region_limiters_lock
+        return aws
+
+    def across_regions(self, regions, fn, max_workers=None):
+        """Call fn(aws) with an AWS object for each region, running the
+        regions concurrently on a pool of max_workers threads (default: one
+        per region). Pass regions=None for every EC2 region. Returns a
+        RegionResults dict of fn's return values by region; exceptions are
+        collected per region in its errors attribute.
+        """
+        if regions is None:
+            regions = [r['RegionName']
+                       for r in self.ec2.regions(continent='all')]
+        results = RegionResults()
+        if not regions:
+            return results
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        def run(region):
+            return fn(self.for_region(region))
+
+        pool = ThreadPoolExecutor(max_workers=max_workers or len(regions))
+        try:
+            futures = dict((pool.submit(run, region), region)
+                           for region in regions)
+            for future in as_completed(futures):
+                region = futures[future]
+                try:
+                    results[region] = future.result()
+                except Exception as e:
+                    results.errors[region] = e
+        finally:
+            pool.shutdown(wait=True)
+        return results
 
     @property
     def userinfo(self):
         if not hasattr(self, '_user'):
-            self._user = self.iam.Users.get_current()
+            with self._lock:
+                if not hasattr(self, '_user'):
+                    self._user = self.iam.Users.get_current()
         return self._user
 
     @property
@@ -45,24 +214,30 @@ class AWS(object):
 
     @property
     def ec2(self):
+        import acky.ec2
         return acky.ec2.EC2(self)
 
     @property
     def iam(self):
+        import acky.iam
         return acky.iam.IAM(self)
 
     @property
     def rds(self):
+        import acky.rds
         return acky.rds.RDS(self)
 
     @property
     def sqs(self):
+        import acky.sqs
         return acky.sqs.SQS(self)
 
     @property
     def sts(self):
+        import acky.sts
         return acky.sts.STS(self)
 
     @property
     def s3(self):
+        import acky.s3
         return acky.s3.S3(self)
@@ -0,0 +1,209 @@
+"""Caching and coalescing of responses to read-only AWS API calls"""
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+READ_ONLY_PREFIXES = ('Describe', 'List', 'Get')
+
+# Read-looking operations whose responses must not be reused.
+UNCACHEABLE_OPERATIONS = frozenset([
+    'GetFederationToken',
+    'GetSessionToken',
+    'GetObject',
+])
+
+
+def is_read_only(operation):
+    return operation.startswith(READ_ONLY_PREFIXES)
+
+
+def is_shareable(operation, op=None):
+    """True if one response to operation may be handed to several callers:
+    it only reads, and its body is not a stream."""
+    if not is_read_only(operation):
+        return False
+    if operation in UNCACHEABLE_OPERATIONS:
+        return False
+    return op is None or not op.is_streaming()
+
+
+def _freeze(value):
+    """Turn request parameters into a hashable value; dict and set ordering
+    is normalized, list ordering is kept."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+def request_key(service_name, region, operation, params):
+    return (service_name, region, operation, _freeze(params))
+
+
+class ResponseCache(object):
+    """LRU cache of parsed responses for read-only operations (Describe*,
+    List*, Get*), keyed by service, region, operation and parameters.
+
+    Entries live for `ttl` seconds unless `ttls` gives an operation its own
+    lifetime; it may be keyed by operation name or (service, operation),
+    and a TTL of 0 disables caching for that operation. Any other operation
+    sent to a service drops that service's entries for the region, so a
+    Create*/Delete*/Modify* call is never followed by a stale Describe*.
+    Callers get their own copy of cached data.
+
+    A response read while a mutating call was in progress may predate it,
+    so readers take generation() before sending and pass it to put(),
+    which drops the response if the entries were invalidated meanwhile.
+    """
+    def __init__(self, max_size=1024, ttl=60, ttls=None, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        # Invalidations of every entry, and of each (service, region).
+        self._epoch = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, service_name, operation):
+        ttl = self.ttls.get((service_name, operation))
+        if ttl is None:
+            ttl = self.ttls.get(operation, self.ttl)
+        return ttl
+
+    def cacheable(self, service_name, operation, op=None):
+        if not is_shareable(operation, op):
+            return False
+        return bool(self.ttl_for(service_name, operation))
+
+    def get(self, key):
+        """Return a copy of the cached data for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, data = entry
+                if expires > self._clock():
+                    self._move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(data)
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def generation(self, service_name, region):
+        """Return a value that changes whenever the entries for a service
+        and region are invalidated."""
+        return (self._epoch, self._generations.get((service_name, region), 0))
+
+    def put(self, key, data, generation=None):
+        """Cache data for key, unless generation is given and the entries
+        for key's service and region have been invalidated since it was
+        taken."""
+        service_name, region, operation, _ = key
+        expires = self._clock() + self.ttl_for(service_name, operation)
+        data = copy.deepcopy(data)
+        with self._lock:
+            if generation is not None and \
+                    generation != self.generation(service_name, region):
+                return
+            self._entries[key] = (expires, data)
+            self._move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _move_to_end(self, key):
+        # OrderedDict.move_to_end() is not available on Python 2
+        self._entries[key] = self._entries.pop(key)
+
+    def invalidate(self, service_name=None, region=None):
+        """Drop entries for a service and/or region, or all entries."""
+        with self._lock:
+            if service_name is None or region is None:
+                self._epoch += 1
+            else:
+                key = (service_name, region)
+                self._generations[key] = self._generations.get(key, 0) + 1
+            if service_name is None and region is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if service_name not in (None, key[0]):
+                    continue
+                if region not in (None, key[1]):
+                    continue
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """Coalesces identical calls that are in flight at the same time: the
+    first caller for a key runs the call, and callers arriving before it
+    finishes wait and receive a copy of its result (or its exception)
+    instead of sending their own request. Nobody mutates the shared result
+    itself, so copies are only made when a call was actually shared.
+
+    Keys are request_key()s. After a mutating call, invalidate() its
+    service and region so that later reads start a flight of their own
+    rather than join one that may have been sent before the change.
+    """
+    def __init__(self):
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+        if flight.waiters:
+            return copy.deepcopy(flight.result)
+        return flight.result
+
+    def invalidate(self, service_name=None, region=None):
+        """Stop new callers joining the flights in progress for a service
+        and/or region, or all flights. Their current callers still get
+        their results."""
+        with self._lock:
+            for key in list(self._flights):
+                if service_name not in (None, key[0]):
+                    continue
+                if region not in (None, key[1]):
+                    continue
+                del self._flights[key]
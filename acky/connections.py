@@ -0,0 +1,119 @@
+"""HTTP connection pool settings for the endpoints of an AWS object"""
+import socket
+
+
+class HttpConfig(object):
+    """Connection settings applied to every endpoint an AWS object uses.
+
+    max_pool_connections is the number of connections kept open per host;
+    with pool_block=True, threads beyond that wait for a free connection
+    instead of opening one that is thrown away afterwards. Set it to at
+    least the number of threads calling one service. keep_alive=False
+    closes each connection after its response. Timeouts are in seconds
+    (None waits forever), and socket_options is a list of
+    (level, option, value) tuples set on each new socket, after the
+    TCP_NODELAY and SO_KEEPALIVE options that tcp_nodelay and tcp_keepalive
+    control.
+    """
+    def __init__(self, max_pool_connections=10, pool_block=False,
+                 keep_alive=True, connect_timeout=None, read_timeout=None,
+                 tcp_nodelay=True, tcp_keepalive=False, socket_options=None):
+        self.max_pool_connections = max_pool_connections
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.tcp_nodelay = tcp_nodelay
+        self.tcp_keepalive = tcp_keepalive
+        self.socket_options = list(socket_options or [])
+
+    def _key(self):
+        return (self.max_pool_connections, self.pool_block, self.keep_alive,
+                self.connect_timeout, self.read_timeout, self.tcp_nodelay,
+                self.tcp_keepalive, tuple(self.socket_options))
+
+    def __eq__(self, other):
+        return isinstance(other, HttpConfig) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def all_socket_options(self):
+        options = []
+        if self.tcp_nodelay:
+            options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+        if self.tcp_keepalive:
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        return options + self.socket_options
+
+    def apply(self, endpoint):
+        """Mount an adapter with these settings on a botocore endpoint's
+        HTTP session."""
+        adapter = _make_adapter(self)
+        endpoint.http_session.mount('http://', adapter)
+        endpoint.http_session.mount('https://', adapter)
+        return endpoint
+
+
+def _connect(connection, base_connect):
+    config = connection.http_config
+    if config.connect_timeout is not None:
+        connection.timeout = config.connect_timeout
+    base_connect(connection)
+    for level, option, value in config.all_socket_options():
+        connection.sock.setsockopt(level, option, value)
+    # Sending the request is bounded by the read timeout, not the connect one.
+    connection.sock.settimeout(config.read_timeout)
+
+
+def _make_adapter(config):
+    from botocore.vendored.requests.adapters import HTTPAdapter
+    from botocore.vendored.requests.packages.urllib3 import connectionpool
+    from botocore.vendored.requests.packages.urllib3.poolmanager import \
+        PoolManager
+
+    http_base = connectionpool.HTTPConnectionPool.ConnectionCls
+    https_base = connectionpool.HTTPSConnectionPool.ConnectionCls
+
+    class _HTTPConnection(http_base):
+        http_config = config
+
+        def connect(self):
+            _connect(self, http_base.connect)
+
+    class _HTTPSConnection(https_base):
+        http_config = config
+
+        def connect(self):
+            _connect(self, https_base.connect)
+
+    connection_classes = {'http': _HTTPConnection,
+                          'https': _HTTPSConnection}
+
+    class _PoolManager(PoolManager):
+        def _new_pool(self, scheme, host, port):
+            pool = PoolManager._new_pool(self, scheme, host, port)
+            pool.ConnectionCls = connection_classes[scheme]
+            return pool
+
+    class _Adapter(HTTPAdapter):
+        def init_poolmanager(self, connections, maxsize, block=False):
+            self._pool_connections = connections
+            self._pool_maxsize = maxsize
+            self._pool_block = block
+            self.poolmanager = _PoolManager(num_pools=connections,
+                                            maxsize=maxsize, block=block)
+
+        def send(self, request, stream=False, timeout=None, **kwargs):
+            if not config.keep_alive:
+                request.headers['Connection'] = 'close'
+            if timeout is None:
+                timeout = config.read_timeout
+            return HTTPAdapter.send(self, request, stream=stream,
+                                    timeout=timeout, **kwargs)
+
+    return _Adapter(pool_maxsize=config.max_pool_connections,
+                    pool_block=config.pool_block)
@@ -2,8 +2,54 @@ from acky.api import (
     AwsCollection,
     AwsApiClient,
     make_filters,
+    make_projection,
+    AWSCallError,
 )
+from acky.records import (
+    ImageRecord,
+    InstanceRecord,
+    SnapshotRecord,
+    VolumeRecord,
+    compact as compact_records,
+)
+from acky.trace import traced
+from acky.waiters import Waiter
 from itertools import chain
+import re
+
+
+# Instances can be listed in parallel by one of these filters.
+SHARD_FILTERS = {
+    'az': 'availability-zone',
+    'subnet': 'subnet-id',
+    'state': 'instance-state-name',
+}
+# Most instances start/stop/reboot/terminate is sent for in one call.
+CONTROL_CHUNK = 1000
+# Errors whose message names the instance IDs a control call failed for.
+INSTANCE_ID_ERRORS = ('InvalidInstanceID.NotFound',
+                      'InvalidInstanceID.Malformed')
+# Instances per DescribeInstances page when listing page by page, unless
+# page_size says otherwise. Without MaxResults AWS sends one huge page.
+PAGE_SIZE = 1000
+INSTANCE_STATES = ('pending', 'running', 'shutting-down', 'terminated',
+                   'stopping', 'stopped')
+
+
+def _instance_projection(fields):
+    """Project reservations down to the given fields of their instances."""
+    if isinstance(fields, str):
+        fields = [fields]
+    return make_projection(['Instances.' + field for field in fields])
+
+
+class InstanceResults(dict):
+    """Results of a bulk InstanceCollection.control() keyed by instance ID.
+    Instances the action failed for are left out and their exceptions kept
+    in the errors dict."""
+    def __init__(self):
+        super(InstanceResults, self).__init__()
+        self.errors = {}
 
 
 class EC2ApiClient(AwsApiClient):
@@ -148,6 +194,7 @@ class ElasticIPCollection(AwsCollection, EC2ApiClient):
         return self.call("AllocateAddress",
                          Domain="vpc" if vpc else "standard")
 
+    @traced
     def destroy(self, eip_or_aid, disassociate=False):
         """Release an EIP. If the EIP was allocated for a VPC instance, an
         AllocationId(aid) must be provided instead of a PublicIp. Setting
@@ -201,47 +248,190 @@ class ElasticIPCollection(AwsCollection, EC2ApiClient):
 
 class InstanceCollection(AwsCollection, EC2ApiClient):
 
-    def get(self, instance_ids=None, filters=None):
-        """List instance info."""
+    def get(self, instance_ids=None, filters=None, stream=False,
+            compact=False, fields=None, page_size=None, shard_by=None,
+            shard_workers=None):
+        """List instance info. Set stream=True to get an iterator that
+        follows pagination and yields instances as pages arrive; pages are
+        fetched only as the iterator is consumed, and page_size (5 to 1000,
+        default PAGE_SIZE) sets how many instances each one holds.
+        compact=True gives acky.records.InstanceRecord objects, which take
+        far less memory than dicts, and fields limits each instance to the
+        given paths (see acky.api.make_projection()).
+
+        shard_by ('az', 'subnet' or 'state') lists every instance, not just
+        the first page, by splitting the query into one paginated query per
+        availability zone, subnet or state and running them on up to
+        shard_workers threads (default 10). Instances are deduplicated by
+        ID, so InstanceId is kept even if fields leaves it out. Sharding by
+        subnet only finds instances in a VPC.
+        """
+        if page_size is None:
+            page_size = PAGE_SIZE
+        if shard_by is not None:
+            if shard_by not in SHARD_FILTERS:
+                raise ValueError("shard_by must be one of {0}".format(
+                    ", ".join(sorted(SHARD_FILTERS))))
+            if instance_ids:
+                raise ValueError("shard_by cannot be used with instance_ids")
+            if fields:
+                if isinstance(fields, str):
+                    fields = [fields]
+                fields = list(fields) + ['InstanceId']
+            instances = self._sharded_get(
+                shard_by, filters,
+                _instance_projection(fields) if fields else None,
+                page_size, shard_workers)
+            if compact:
+                return compact_records(InstanceRecord, instances, stream)
+            return instances if stream else list(instances)
         params = {}
         if filters:
             params["filters"] = make_filters(filters)
         if instance_ids:
             params['InstanceIds'] = instance_ids
+            # AWS does not accept MaxResults along with InstanceIds.
+            page_size = None
+        projection = None
+        if fields:
+            projection = _instance_projection(fields)
+        if stream:
+            reservations = self.iter_call("DescribeInstances",
+                                          response_data_key="Reservations",
+                                          projection=projection,
+                                          page_size=page_size,
+                                          **params)
+            instances = chain.from_iterable(r["Instances"]
+                                            for r in reservations)
+            if compact:
+                return compact_records(InstanceRecord, instances, stream)
+            return instances
         reservations = self.call("DescribeInstances",
                                  response_data_key="Reservations",
                                  **params)
-        if reservations:
-            return list(chain(*(r["Instances"] for r in reservations)))
-        return []
+        if not reservations:
+            return []
+        if projection is not None:
+            reservations = [projection(r) for r in reservations]
+        if compact:
+            return compact_records(InstanceRecord, chain.from_iterable(
+                r["Instances"] for r in reservations))
+        return list(chain.from_iterable(r["Instances"] for r in reservations))
+
+    def _sharded_get(self, shard_by, filters, projection, page_size,
+                     max_workers):
+        """Yield the instances of every shard, as each shard completes."""
+        name = SHARD_FILTERS[shard_by]
+        filters = dict(filters or {})
+        values = filters.pop(name, None)
+        if values is None:
+            values = self._shard_values(shard_by)
+        elif isinstance(values, str):
+            values = [values]
+        if not values:
+            return
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        def shard(value):
+            shard_filters = dict(filters)
+            shard_filters[name] = value
+            reservations = self.iter_call("DescribeInstances",
+                                          response_data_key="Reservations",
+                                          projection=projection,
+                                          page_size=page_size,
+                                          filters=make_filters(shard_filters))
+            return list(chain.from_iterable(r["Instances"]
+                                            for r in reservations))
+
+        pool = ThreadPoolExecutor(max_workers=min(max_workers or 10,
+                                                  len(values)))
+        futures = [pool.submit(shard, value) for value in values]
+        try:
+            # An instance changing state between shards is seen twice.
+            seen = set()
+            for future in as_completed(futures):
+                for instance in future.result():
+                    if instance['InstanceId'] in seen:
+                        continue
+                    seen.add(instance['InstanceId'])
+                    yield instance
+        finally:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+    def _shard_values(self, shard_by):
+        if shard_by == 'az':
+            zones = self.call("DescribeAvailabilityZones",
+                              response_data_key="AvailabilityZones")
+            return [zone['ZoneName'] for zone in zones or ()]
+        if shard_by == 'subnet':
+            subnets = self.call("DescribeSubnets",
+                                response_data_key="Subnets")
+            return [subnet['SubnetId'] for subnet in subnets or ()]
+        return list(INSTANCE_STATES)
+
+    def find(self, predicate, filters=None, fields=None, page_size=None):
+        """Return the first instance for which predicate(instance) is true,
+        or None. Pages of page_size (default PAGE_SIZE) instances are
+        fetched one at a time, and paging stops at the first match; narrow
+        the search with filters where AWS supports them."""
+        for instance in self.get(filters=filters, stream=True, fields=fields,
+                                 page_size=page_size):
+            if predicate(instance):
+                return instance
+        return None
+
+    def load(self, instance_id):
+        """Return a Future for one instance's info, or None if it does not
+        exist. Concurrent load() calls are batched into a single
+        DescribeInstances request, filtered by ID so that a missing ID does
+        not fail the others."""
+        loader = self.batch_loader(
+            "DescribeInstances",
+            lambda ids: self.get(filters={'instance-id': ids}),
+            key=lambda instance: instance['InstanceId'])
+        return loader.load(instance_id)
 
     def create(self, ami, count, config=None):
         """Create an instance using the launcher."""
         return self.Launcher(config=config).launch(ami, count)
 
     def destroy(self, instance_id):
-        """Terminate a single given instance."""
+        """Terminate a single given instance, raising if that fails."""
         return self.control(instance_id, "terminate")
 
-    def control(self, instances, action):
+    @traced
+    def control(self, instances, action, max_workers=10,
+                raise_on_error=None):
         """Valid actions: start, stop, reboot, terminate, protect, and
         unprotect.
+
+        start, stop, reboot and terminate are sent for up to CONTROL_CHUNK
+        instances per call; protect and unprotect take a call per
+        instance. The calls run on up to max_workers threads, within the
+        AWS object's rate limits. Returns an InstanceResults dict with,
+        per instance, its state change (or True); instances the action
+        failed for are in its errors dict instead.
+
+        With raise_on_error, the exception of the first instance that
+        failed is raised once every call has been made. It defaults to
+        true when instances is a single ID rather than a list or tuple.
         """
         if not isinstance(instances, list) and\
            not isinstance(instances, tuple):
             instances = [instances]
+            if raise_on_error is None:
+                raise_on_error = True
         actions = {'start': {'operation': "StartInstances",
-                             'response_data_key': "StartingInstances",
-                             'InstanceIds': instances},
+                             'response_data_key': "StartingInstances"},
                    'stop': {'operation': "StopInstances",
-                            'response_data_key': "StoppingInstances",
-                            'InstanceIds': instances},
+                            'response_data_key': "StoppingInstances"},
                    'reboot': {'operation': "RebootInstances",
-                              'response_data_key': "return",
-                              'InstanceIds': instances},
+                              'response_data_key': "return"},
                    'terminate': {'operation': "TerminateInstances",
-                                 'response_data_key': "TerminatingInstances",
-                                 'InstanceIds': instances},
+                                 'response_data_key': "TerminatingInstances"},
                    'protect': {'operation': "ModifyInstanceAttribute",
                                'response_data_key': "return",
                                'Attribute': 'disableApiTermination',
@@ -250,12 +440,101 @@ class InstanceCollection(AwsCollection, EC2ApiClient):
                                  'response_data_key': "return",
                                  'Attribute': 'disableApiTermination',
                                  'Value': 'false'}}
-        if (action in ('protect', 'unprotect')):
-            for instance in instances:
-                self.call(InstanceId=instance, **actions[action])
-            return "true"
+        params = actions[action]
+        results = InstanceResults()
+        if action in ('protect', 'unprotect'):
+            def run(instance):
+                try:
+                    self.call(InstanceId=instance, **params)
+                except Exception as e:
+                    results.errors[instance] = e
+                else:
+                    results[instance] = True
+            batches = instances
+        else:
+            def run(chunk):
+                self._control_chunk(chunk, params, results)
+            batches = [list(instances[start:start + CONTROL_CHUNK])
+                       for start in range(0, len(instances), CONTROL_CHUNK)]
+        max_workers = max_workers or 10
+        if len(batches) <= 1 or max_workers <= 1:
+            for batch in batches:
+                run(batch)
         else:
-            return self.call(**actions[action])
+            from concurrent.futures import ThreadPoolExecutor
+            if self._tracer is not None and self._tracer.active:
+                run = self._tracer.propagate(run)
+            pool = ThreadPoolExecutor(
+                max_workers=min(max_workers, len(batches)))
+            try:
+                for future in [pool.submit(run, batch) for batch in batches]:
+                    future.result()
+            finally:
+                pool.shutdown(wait=True)
+        if raise_on_error and results.errors:
+            for instance in instances:
+                if instance in results.errors:
+                    raise results.errors[instance]
+        return results
+
+    def _control_chunk(self, chunk, params, results):
+        """Apply a start/stop/reboot/terminate action to a chunk. If AWS
+        rejects the chunk because of some of its IDs (e.g. one does not
+        exist), those named in the error fail and the rest are sent again;
+        if the error names none of them, the chunk is split in two and each
+        half retried, so only the bad IDs fail."""
+        try:
+            changes = self.call(InstanceIds=chunk, **params)
+        except AWSCallError as e:
+            if len(chunk) > 1 and e.code in INSTANCE_ID_ERRORS:
+                named = set(re.findall(r"[\w-]+", e.message or ''))
+                rest = [instance for instance in chunk
+                        if instance not in named]
+                results.errors.update((instance, e) for instance in chunk
+                                      if instance in named)
+                if len(rest) == len(chunk):
+                    middle = len(chunk) // 2
+                    self._control_chunk(chunk[:middle], params, results)
+                    self._control_chunk(chunk[middle:], params, results)
+                elif rest:
+                    self._control_chunk(rest, params, results)
+            else:
+                results.errors.update((instance, e) for instance in chunk)
+            return
+        except Exception as e:
+            results.errors.update((instance, e) for instance in chunk)
+            return
+        for instance in chunk:
+            results[instance] = True
+        if isinstance(changes, list):
+            results.update((change['InstanceId'], change)
+                           for change in changes)
+
+    def wait_until_running(self, instance_ids, timeout=600, callback=None,
+                           block=True, **options):
+        """Wait for instances to be running, describing all that are still
+        pending in one DescribeInstances call per poll. Returns a
+        WaitResults dict of the running instances, with instances that
+        began stopping or terminating, or timed out, in its errors; with
+        block=False, returns a dict of Futures at once instead. callback
+        and options (interval, max_interval, ...) are as for
+        acky.waiters.Waiter. Polls bypass the response cache.
+
+        Instances still seen as stopped are waited for, since one that was
+        just started may be described as stopped for a while."""
+        def describe(ids):
+            reservations = self.iter_call(
+                "DescribeInstances", response_data_key="Reservations",
+                filters=make_filters({'instance-id': ids}), cache=False)
+            return chain.from_iterable(r["Instances"] for r in reservations)
+
+        waiter = Waiter(
+            describe, 'InstanceId', lambda instance: instance['State']['Name'],
+            'running', failures=('shutting-down', 'terminated', 'stopping'),
+            timeout=timeout, callback=callback, **options)
+        if block:
+            return waiter.wait(instance_ids)
+        return waiter.start(instance_ids)
 
     def Launcher(self, config=None):
         """Provides a configurable launcher for EC2 instances."""
@@ -287,8 +566,10 @@ class InstanceCollection(AwsCollection, EC2ApiClient):
             config = {}
         return _launcher(self._aws, config)
 
-    def status(self, all_instances=None, instance_ids=None, filters=None):
-        """List instance info."""
+    def status(self, all_instances=None, instance_ids=None, filters=None,
+               stream=False):
+        """List instance status. Set stream=True to get an iterator that
+        follows pagination."""
         params = {}
         if filters:
             params["filters"] = make_filters(filters)
@@ -296,11 +577,16 @@ class InstanceCollection(AwsCollection, EC2ApiClient):
             params['InstanceIds'] = instance_ids
         if all_instances is not None:
             params['IncludeAllInstances'] = all_instances
+        if stream:
+            return self.iter_call("DescribeInstanceStatus",
+                                  response_data_key="InstanceStatuses",
+                                  **params)
         statuses = self.call("DescribeInstanceStatus",
                              response_data_key="InstanceStatuses",
                              **params)
         return statuses
 
+    @traced
     def events(self, all_instances=None, instance_ids=None, filters=None):
         """a list of tuples containing instance Id's and event information"""
         params = {}
@@ -470,18 +756,69 @@ class VolumeCollection(AwsCollection, EC2ApiClient):
     """Interface to get, create, destroy, and attach for EBS Volumes.
     (Amazon EC2 API Version 2014-06-15)
     """
-    def get(self, volume_ids=None, filters=None):
-        """List EBS Volume info."""
+    def get(self, volume_ids=None, filters=None, compact=False,
+            fields=None):
+        """List EBS Volume info. Set compact=True to get
+        acky.records.VolumeRecord objects instead of dicts, and fields to
+        keep only some of each volume's fields."""
         params = {}
         if filters:
             params["filters"] = make_filters(filters)
         if isinstance(volume_ids, str):
             volume_ids = [volume_ids]
-        return self.call("DescribeVolumes",
-                         VolumeIds=volume_ids,
-                         response_data_key="Volumes",
+        volumes = self.call("DescribeVolumes",
+                            VolumeIds=volume_ids,
+                            response_data_key="Volumes",
+                            **params)
+        if fields and volumes:
+            projection = make_projection(fields)
+            volumes = [projection(v) for v in volumes]
+        if compact and volumes:
+            return compact_records(VolumeRecord, volumes)
+        return volumes
+
+    def status(self, volume_ids=None, filters=None, stream=False):
+        """List volume status. Set stream=True to get an iterator that
+        follows pagination."""
+        params = {}
+        if filters:
+            params["filters"] = make_filters(filters)
+        if volume_ids:
+            params['VolumeIds'] = volume_ids
+        if stream:
+            return self.iter_call("DescribeVolumeStatus",
+                                  response_data_key="VolumeStatuses",
+                                  **params)
+        return self.call("DescribeVolumeStatus",
+                         response_data_key="VolumeStatuses",
                          **params)
 
+    def wait_until_available(self, volume_ids, timeout=600, callback=None,
+                             block=True, **options):
+        """Wait for volumes to be available, as wait_until_running() does
+        for instances. Volumes in the error state fail."""
+        waiter = Waiter(
+            lambda ids: self.call("DescribeVolumes",
+                                  response_data_key="Volumes",
+                                  filters=make_filters({'volume-id': ids}),
+                                  cache=False),
+            'VolumeId', lambda volume: volume['State'], 'available',
+            failures=('error', 'deleting', 'deleted'),
+            timeout=timeout, callback=callback, **options)
+        if block:
+            return waiter.wait(volume_ids)
+        return waiter.start(volume_ids)
+
+    def load(self, volume_id):
+        """Return a Future for one volume's info, or None if it does not
+        exist. Concurrent load() calls are batched into a single
+        DescribeVolumes request, filtered by ID."""
+        loader = self.batch_loader(
+            "DescribeVolumes",
+            lambda ids: self.get(filters={'volume-id': ids}),
+            key=lambda volume: volume['VolumeId'])
+        return loader.load(volume_id)
+
     def create(self, az, size_or_snap, volume_type=None, iops=None,
                encrypted=True):
         """Create an EBS Volume using an availability-zone and size_or_snap
@@ -526,15 +863,53 @@ class VolumeCollection(AwsCollection, EC2ApiClient):
 
 
 class SnapshotCollection(AwsCollection, EC2ApiClient):
-    def get(self, filters=None):
+    def get(self, filters=None, stream=False, compact=False, fields=None):
         # returns (snap_info, ...)
         # DescribeSnapshots
         params = {}
         if filters:
             params["filters"] = make_filters(filters)
-        return self.call("DescribeSnapshots",
-                         response_data_key="Snapshots",
-                         **params)
+        projection = make_projection(fields) if fields else None
+        if stream:
+            snapshots = self.iter_call("DescribeSnapshots",
+                                       response_data_key="Snapshots",
+                                       projection=projection,
+                                       **params)
+        else:
+            snapshots = self.call("DescribeSnapshots",
+                                  response_data_key="Snapshots",
+                                  **params)
+            if projection is not None and snapshots:
+                snapshots = [projection(s) for s in snapshots]
+        if compact and snapshots:
+            return compact_records(SnapshotRecord, snapshots, stream)
+        return snapshots
+
+    def wait_until_completed(self, snapshot_ids, timeout=3600, callback=None,
+                             block=True, **options):
+        """Wait for snapshots to complete, as wait_until_running() does
+        for instances. Snapshots in the error state fail."""
+        waiter = Waiter(
+            lambda ids: self.call("DescribeSnapshots",
+                                  response_data_key="Snapshots",
+                                  filters=make_filters({'snapshot-id': ids}),
+                                  cache=False),
+            'SnapshotId', lambda snapshot: snapshot['State'], 'completed',
+            failures=('error',), timeout=timeout, callback=callback,
+            **options)
+        if block:
+            return waiter.wait(snapshot_ids)
+        return waiter.start(snapshot_ids)
+
+    def load(self, snapshot_id):
+        """Return a Future for one snapshot's info, or None if it does not
+        exist. Concurrent load() calls are batched into a single
+        DescribeSnapshots request, filtered by ID."""
+        loader = self.batch_loader(
+            "DescribeSnapshots",
+            lambda ids: self.get(filters={'snapshot-id': ids}),
+            key=lambda snapshot: snapshot['SnapshotId'])
+        return loader.load(snapshot_id)
 
     def create(self, volume_id, description=None):
         # returns snap_info
@@ -598,12 +973,16 @@ class VPCCollection(AwsCollection, EC2ApiClient):
 
 
 class TagCollection(AwsCollection, EC2ApiClient):
-    def get(self, filters=None):
+    def get(self, filters=None, stream=False):
         # returns (tag_info, ...)
         # DescribeTags
         params = {}
         if filters:
             params["filters"] = make_filters(filters)
+        if stream:
+            return self.iter_call("DescribeTags",
+                                  response_data_key="Tags",
+                                  **params)
         return self.call("DescribeTags",
                          response_data_key="Tags",
                          **params)
@@ -620,7 +999,8 @@ class TagCollection(AwsCollection, EC2ApiClient):
 
 
 class ImageCollection(AwsCollection, EC2ApiClient):
-    def get(self, image_ids=None, owners=None, executable_users=None, filters=None):
+    def get(self, image_ids=None, owners=None, executable_users=None,
+            filters=None, stream=False, compact=False, fields=None):
         # returns (image_info, ...)
         # DescribeImages
         params = {}
@@ -632,9 +1012,21 @@ class ImageCollection(AwsCollection, EC2ApiClient):
             params["Owners"] = owners
         if executable_users:
             params["ExecutableUsers"] = executable_users
-        return self.call("DescribeImages",
-                         response_data_key="Images",
-                         **params)
+        projection = make_projection(fields) if fields else None
+        if stream:
+            images = self.iter_call("DescribeImages",
+                                    response_data_key="Images",
+                                    projection=projection,
+                                    **params)
+        else:
+            images = self.call("DescribeImages",
+                               response_data_key="Images",
+                               **params)
+            if projection is not None and images:
+                images = [projection(i) for i in images]
+        if compact and images:
+            return compact_records(ImageRecord, images, stream)
+        return images
 
     def create(self, instance_id, name, no_reboot=True, description=None, block_device_mappings=None):
         # returns image_id
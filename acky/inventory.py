@@ -0,0 +1,294 @@
+"""An indexed, incrementally refreshed view of an account's EC2 fleet
+
+Ec2Inventory loads every instance and volume in a region once, indexes them
+by tag, subnet, VPC, availability zone and state, and answers queries from
+those indexes::
+
+    inventory = Ec2Inventory(aws)
+    inventory.load()
+    web = inventory.instances(state='running', tag=('role', 'web'))
+
+refresh() then brings it up to date without describing the whole fleet
+again. One paginated DescribeInstanceStatus call lists every instance's
+state; only instances that are new, or whose state changed, are described
+again, along with their volumes, and instances that have gone are dropped.
+Likewise DescribeVolumeStatus lists every volume ID, so that volumes that
+were created or deleted are described or dropped.
+
+Two kinds of change have no such cheap signal:
+
+* Tags. With tags=True (the default), each refresh lists every instance and
+  volume tag with DescribeTags, a paginated call whose cost grows with the
+  number of tags in the region rather than the number of changes. Pass
+  tags=False to skip it when tags are not queried or rarely change.
+* A volume attached to or detached from an instance whose state did not
+  change. The next load() finds it; refresh() does one every full_refresh
+  seconds, which defaults to VOLUME_FULL_REFRESH when volumes are held.
+"""
+import threading
+import time
+
+# Instances and volumes are described by ID filter, in chunks of this size.
+FILTER_CHUNK = 200
+# Seconds between full loads when volumes are held, unless set.
+VOLUME_FULL_REFRESH = 3600
+INSTANCE_INDEXES = ('tag', 'tag_key', 'subnet', 'vpc', 'az', 'state')
+VOLUME_INDEXES = ('tag', 'tag_key', 'az', 'state', 'instance')
+
+
+def _chunks(items, size=FILTER_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _tag_pairs(item):
+    return [(tag['Key'], tag.get('Value')) for tag in item.get('Tags') or ()]
+
+
+def _instance_keys(instance):
+    tags = _tag_pairs(instance)
+    return {
+        'tag': tags,
+        'tag_key': [key for key, _ in tags],
+        'subnet': [instance.get('SubnetId')],
+        'vpc': [instance.get('VpcId')],
+        'az': [(instance.get('Placement') or {}).get('AvailabilityZone')],
+        'state': [(instance.get('State') or {}).get('Name')],
+    }
+
+
+def _volume_keys(volume):
+    tags = _tag_pairs(volume)
+    return {
+        'tag': tags,
+        'tag_key': [key for key, _ in tags],
+        'az': [volume.get('AvailabilityZone')],
+        'state': [volume.get('State')],
+        'instance': [attachment.get('InstanceId')
+                     for attachment in volume.get('Attachments') or ()],
+    }
+
+
+class _IndexedSet(object):
+    """Items by ID, with a hash index per key that index_keys(item)
+    returns. Not thread-safe; Ec2Inventory locks around it."""
+    def __init__(self, id_key, index_keys, names):
+        self.id_key = id_key
+        self.index_keys = index_keys
+        self.names = names
+        self.items = {}
+        self.indexes = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item):
+        item_id = item[self.id_key]
+        self.discard(item_id)
+        self.items[item_id] = item
+        for name, values in self.index_keys(item).items():
+            index = self.indexes.setdefault(name, {})
+            for value in values:
+                if value is not None:
+                    index.setdefault(value, set()).add(item_id)
+
+    def discard(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        for name, values in self.index_keys(item).items():
+            index = self.indexes[name]
+            for value in values:
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(item_id)
+                    if not ids:
+                        del index[value]
+
+    def query(self, criteria):
+        """Return the items matching every index=value in criteria. The
+        smallest index set is scanned, so this is O(k) for k matches of
+        the most selective criterion."""
+        if not criteria:
+            return list(self.items.values())
+        sets = []
+        for name, value in criteria.items():
+            if name not in self.names:
+                raise TypeError("unknown criterion {0!r}".format(name))
+            sets.append(self.indexes.get(name, {}).get(value, ()))
+        sets.sort(key=len)
+        ids = [item_id for item_id in sets[0]
+               if all(item_id in other for other in sets[1:])]
+        return [self.items[item_id] for item_id in ids]
+
+
+class Ec2Inventory(object):
+    """Instances and volumes of one AWS object's region, indexed for
+    lookups. Queries are safe to run from other threads while a refresh
+    is in progress; they see the state before or after each change.
+
+    refresh() calls load() instead once full_refresh seconds have passed
+    since the last load, by default never without volumes and every
+    VOLUME_FULL_REFRESH seconds with them. Pass float('inf') to never
+    reload."""
+    def __init__(self, aws, volumes=True, tags=True, full_refresh=None):
+        self.instance_client = aws.ec2.Instances
+        self.volume_client = aws.ec2.Volumes if volumes else None
+        self.tag_client = aws.ec2.Tags if tags else None
+        if full_refresh is None and volumes:
+            full_refresh = VOLUME_FULL_REFRESH
+        self.full_refresh = full_refresh
+        self.loaded_at = None
+        self.refreshed_at = None
+        self._instances = _IndexedSet('InstanceId', _instance_keys,
+                                      INSTANCE_INDEXES)
+        self._volumes = _IndexedSet('VolumeId', _volume_keys, VOLUME_INDEXES)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._instances)
+
+    def load(self):
+        """Describe every instance and volume, replacing what is held."""
+        with self._refresh_lock:
+            instances = _IndexedSet('InstanceId', _instance_keys,
+                                    INSTANCE_INDEXES)
+            for instance in self.instance_client.get(stream=True):
+                instances.put(instance)
+            volumes = _IndexedSet('VolumeId', _volume_keys, VOLUME_INDEXES)
+            if self.volume_client is not None:
+                for volume in self.volume_client.get() or ():
+                    volumes.put(volume)
+            with self._lock:
+                self._instances = instances
+                self._volumes = volumes
+            self.loaded_at = self.refreshed_at = time.time()
+
+    def refresh(self):
+        """Bring the inventory up to date, describing only what changed.
+        Returns a dict of the 'added', 'updated' and 'removed' instance
+        IDs."""
+        stale = self.loaded_at is None or self.full_refresh is not None \
+            and time.time() - self.loaded_at >= self.full_refresh
+        if stale:
+            before = set(self._instances.items)
+            self.load()
+            after = set(self._instances.items)
+            return {'added': after - before, 'updated': set(),
+                    'removed': before - after}
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        known = self._instances.items
+        seen = set()
+        changed = set()
+        for status in self.instance_client.status(all_instances=True,
+                                                  stream=True):
+            instance_id = status['InstanceId']
+            seen.add(instance_id)
+            state = (status.get('InstanceState') or {}).get('Name')
+            instance = known.get(instance_id)
+            if instance is None or \
+                    (instance.get('State') or {}).get('Name') != state:
+                changed.add(instance_id)
+        gone = set(known) - seen
+
+        described = {}
+        for chunk in _chunks(changed):
+            for instance in self.instance_client.get(
+                    filters={'instance-id': chunk}, stream=True):
+                described[instance['InstanceId']] = instance
+        volumes = {}
+        gone_volumes = set()
+        if self.volume_client is not None:
+            known_volumes = set(self._volumes.items)
+            volume_ids = set(status['VolumeId'] for status in
+                             self.volume_client.status(stream=True))
+            for chunk in _chunks(changed):
+                for volume in self.volume_client.get(
+                        filters={'attachment.instance-id': chunk}) or ():
+                    volumes[volume['VolumeId']] = volume
+            # New volumes are described, as are volumes that were attached
+            # to a changed or terminated instance, since they may have been
+            # detached or deleted.
+            attached = self._volumes.indexes.get('instance', {})
+            stale = volume_ids - known_volumes
+            for instance_id in changed | gone:
+                stale.update(attached.get(instance_id, ()))
+            stale.difference_update(volumes)
+            stale.intersection_update(volume_ids)
+            for chunk in _chunks(stale):
+                for volume in self.volume_client.get(
+                        filters={'volume-id': chunk}) or ():
+                    volumes[volume['VolumeId']] = volume
+            gone_volumes = ((known_volumes - volume_ids) | stale) - \
+                set(volumes)
+        tags = self._describe_tags() if self.tag_client is not None else None
+
+        with self._lock:
+            removed = gone | (changed - set(described))
+            added = set(described) - set(known)
+            for instance_id in removed:
+                self._instances.discard(instance_id)
+            for instance in described.values():
+                self._instances.put(instance)
+            for volume_id in gone_volumes:
+                self._volumes.discard(volume_id)
+            for volume in volumes.values():
+                self._volumes.put(volume)
+            updated = set(described) - added
+            if tags is not None:
+                updated.update(self._apply_tags(self._instances, tags))
+                self._apply_tags(self._volumes, tags)
+        self.refreshed_at = time.time()
+        return {'added': added, 'updated': updated, 'removed': removed}
+
+    def _describe_tags(self):
+        tags = {}
+        resource_types = ['instance']
+        if self.volume_client is not None:
+            resource_types.append('volume')
+        for tag in self.tag_client.get(
+                filters={'resource-type': resource_types}, stream=True):
+            tags.setdefault(tag['ResourceId'], []).append(
+                {'Key': tag['Key'], 'Value': tag.get('Value')})
+        return tags
+
+    @staticmethod
+    def _apply_tags(indexed, tags):
+        """Re-tag the items whose tags differ from tags, returning their
+        IDs."""
+        retagged = []
+        for item_id, item in list(indexed.items.items()):
+            current = tags.get(item_id, [])
+            if sorted(_tag_pairs(item)) != sorted(_tag_pairs(
+                    {'Tags': current})):
+                item = dict(item, Tags=current)
+                indexed.put(item)
+                retagged.append(item_id)
+        return retagged
+
+    def instance(self, instance_id):
+        """Return one instance, or None."""
+        return self._instances.items.get(instance_id)
+
+    def instances(self, **criteria):
+        """Return the instances matching all of the given criteria:
+        tag=(key, value), tag_key, subnet, vpc, az and state. With no
+        criteria, return every instance."""
+        with self._lock:
+            return self._instances.query(criteria)
+
+    def volume(self, volume_id):
+        """Return one volume, or None."""
+        return self._volumes.items.get(volume_id)
+
+    def volumes(self, **criteria):
+        """Return the volumes matching all of the given criteria:
+        tag=(key, value), tag_key, az, state and instance (the ID of an
+        instance they are attached to)."""
+        with self._lock:
+            return self._volumes.query(criteria)
@@ -0,0 +1,96 @@
+"""Micro-batching of single-ID lookups into batched Describe calls"""
+from concurrent.futures import Future
+import threading
+
+
+class BatchLoader(object):
+    """Collects single-key lookups made within a short window and sends
+    them as one request.
+
+    fetch(keys) returns the records for a list of keys, and key(record)
+    gives the key a record belongs to. load() returns a Future; a batch is
+    sent `window` seconds after its first key arrives, or as soon as it
+    holds `max_batch` keys. If a batched request fails (e.g. because one of
+    the IDs does not exist), its keys are fetched one at a time so that
+    only the bad key's Future gets the error. Keys with no record resolve
+    to None.
+    """
+    def __init__(self, fetch, key, max_batch=100, window=0.01):
+        self.fetch = fetch
+        self.key = key
+        self.max_batch = max_batch
+        self.window = window
+        self.batches = 0
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        """Return a Future for the record with the given key."""
+        future = Future()
+        with self._lock:
+            self._pending.append((key, future))
+            if len(self._pending) >= self.max_batch:
+                batch = self._take()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            thread = threading.Thread(target=self._dispatch, args=(batch,))
+            thread.daemon = True
+            thread.start()
+        return future
+
+    def load_many(self, keys):
+        """Return a list of Futures, one per key."""
+        return [self.load(key) for key in keys]
+
+    def flush(self):
+        """Send whatever is pending now, in the calling thread."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._dispatch(batch)
+
+    def _take(self):
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _dispatch(self, batch):
+        keys = []
+        for key, _ in batch:
+            if key not in keys:
+                keys.append(key)
+        self.batches += 1
+        try:
+            records = self._fetch(keys)
+        except Exception as e:
+            if len(keys) == 1:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            records = {}
+            errors = {}
+            for key in keys:
+                try:
+                    records.update(self._fetch([key]))
+                except Exception as e:
+                    errors[key] = e
+            for key, future in batch:
+                if key in errors:
+                    future.set_exception(errors[key])
+                else:
+                    future.set_result(records.get(key))
+            return
+        for key, future in batch:
+            future.set_result(records.get(key))
+
+    def _fetch(self, keys):
+        return dict((self.key(record), record)
+                    for record in self.fetch(keys) or ())
@@ -0,0 +1,92 @@
+"""Client-side token-bucket rate limiting for AWS API calls"""
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Allows `rate` requests per second on average and bursts of up to
+    `burst` requests. acquire() reserves a token and sleeps until it is
+    due, so concurrent callers are served in the order they arrive.
+    """
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take `tokens` tokens, blocking until they are available.
+        Returns the number of seconds spent waiting."""
+        with self._lock:
+            now = self._clock()
+            refill = (now - self._updated) * self.rate
+            self._tokens = min(self.burst, self._tokens + refill)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class RateLimiter(object):
+    """A TokenBucket per (service, operation).
+
+    `limits` maps either a service name or a (service name, operation name)
+    tuple to a (rate, burst) pair; an operation's own entry wins over its
+    service's. Operations matching neither use `default`, and are not
+    limited at all if it is None. For example::
+
+        RateLimiter({'ec2': (20, 40),
+                     ('ec2', 'DescribeInstances'): (5, 10)})
+
+    One limiter is shared by every client built from the same AWS object.
+    """
+    def __init__(self, limits=None, default=None, clock=time.time,
+                 sleep=time.sleep):
+        self.limits = dict(limits or {})
+        self.default = default
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def clone(self):
+        """Return a limiter with the same limits and fresh buckets, e.g. for
+        another region, which AWS limits separately."""
+        return RateLimiter(self.limits, self.default, clock=self._clock,
+                           sleep=self._sleep)
+
+    def _limit(self, service_name, operation):
+        limit = self.limits.get((service_name, operation))
+        if limit is None:
+            limit = self.limits.get(service_name, self.default)
+        return limit
+
+    def bucket(self, service_name, operation):
+        """Return the TokenBucket for an operation, or None if unlimited."""
+        key = (service_name, operation)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self._limit(service_name, operation)
+            if limit is None:
+                return None
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate, burst = limit
+                    bucket = TokenBucket(rate, burst, clock=self._clock,
+                                         sleep=self._sleep)
+                    self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, service_name, operation):
+        bucket = self.bucket(service_name, operation)
+        if bucket is None:
+            return 0
+        return bucket.acquire()
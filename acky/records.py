@@ -0,0 +1,244 @@
+"""Compact records for large Describe results
+
+get(compact=True) on Instances, Volumes, Snapshots and Images returns
+records instead of the dicts botocore parses. A record keeps its fields in
+__slots__, interns its strings, and stores nested structures (block device
+mappings, network interfaces, ...) as packed tuples that are turned back
+into dicts and lists only when a field is read. Tags become a TagMap shared
+by every record with the same tags.
+
+Records are read-only mappings, so ``record['InstanceId']`` and
+``record.get('KeyName')`` work as they do on the dicts, and the fields are
+also attributes: ``record.InstanceId``. The one difference is Tags, which
+is a TagMap of key to value rather than a list of Key/Value dicts;
+to_dict() returns the original form.
+"""
+import sys
+import weakref
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    _intern = sys.intern
+except AttributeError:
+    _intern = intern  # noqa: F821 (Python 2)
+
+
+class _PackedDict(tuple):
+    """A nested dict, stored as a tuple of its keys followed by its values.
+    The tuple of keys is shared by every dict with the same keys."""
+    __slots__ = ()
+
+    def items(self):
+        return zip(self[0], self[1:])
+
+
+class _PackedList(tuple):
+    """A nested list, stored as a tuple."""
+    __slots__ = ()
+
+
+# The key sets of the API's structures are few, so this stays small.
+_key_tuples = {}
+
+
+def _keys(keys):
+    return _key_tuples.setdefault(keys, keys)
+
+
+def _pack(value):
+    if type(value) is str:
+        return _intern(value)
+    if isinstance(value, dict):
+        keys = _keys(tuple(value))
+        return _PackedDict((keys,) + tuple(_pack(value[k]) for k in keys))
+    if isinstance(value, list):
+        return _PackedList(_pack(v) for v in value)
+    return value
+
+
+def _unpack(value):
+    if isinstance(value, _PackedDict):
+        return dict((k, _unpack(v)) for k, v in value.items())
+    if isinstance(value, _PackedList):
+        return [_unpack(v) for v in value]
+    return value
+
+
+class TagMap(Mapping):
+    """Read-only mapping of tag key to value. TagMaps are shared: records
+    whose tags are equal hold the same TagMap."""
+    __slots__ = ('_tags', '__weakref__')
+
+    def __init__(self, pairs=()):
+        self._tags = dict(pairs)
+
+    def __getitem__(self, key):
+        return self._tags[key]
+
+    def __iter__(self):
+        return iter(self._tags)
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __repr__(self):
+        return "TagMap({0!r})".format(self._tags)
+
+    def to_list(self):
+        """Return the tags as AWS lists them: [{'Key': k, 'Value': v}]."""
+        return [{'Key': key, 'Value': value}
+                for key, value in sorted(self._tags.items())]
+
+
+_tag_maps = weakref.WeakValueDictionary()
+
+
+def tag_map(tags):
+    """Return the shared TagMap for a list of {'Key': k, 'Value': v}."""
+    pairs = tuple(sorted((_pack(tag['Key']), _pack(tag.get('Value')))
+                         for tag in tags))
+    tags = _tag_maps.get(pairs)
+    if tags is None:
+        # Two threads may both build one; either copy is equally good.
+        tags = _tag_maps.setdefault(pairs, TagMap(pairs))
+    return tags
+
+
+class Record(Mapping):
+    """Base class of the compact records. Fields that the API did not
+    return are missing, as they are from the dicts."""
+    __slots__ = ('_extra',)
+    _fields = ()
+
+    def __init__(self, data):
+        extra = {}
+        for name, value in data.items():
+            slot = self._slot_names.get(name)
+            if slot is None:
+                extra[name] = value
+            elif name == 'Tags':
+                object.__setattr__(self, slot, tag_map(value))
+            else:
+                object.__setattr__(self, slot, _pack(value))
+        self._extra = _pack(extra) if extra else None
+
+    def _raw(self, name):
+        slot = self._slot_names.get(name)
+        if slot is not None:
+            try:
+                return getattr(self, slot)
+            except AttributeError:
+                raise KeyError(name)
+        if self._extra is not None:
+            for key, value in self._extra.items():
+                if key == name:
+                    return value
+        raise KeyError(name)
+
+    def __getitem__(self, name):
+        return _unpack(self._raw(name))
+
+    def __contains__(self, name):
+        try:
+            self._raw(name)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        for name in self._fields:
+            if hasattr(self, self._slot_names[name]):
+                yield name
+        if self._extra is not None:
+            for key in self._extra[0]:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __setattr__(self, name, value):
+        if name != '_extra':
+            raise AttributeError("{0} is read-only".format(
+                type(self).__name__))
+        object.__setattr__(self, name, value)
+
+    def __reduce__(self):
+        return (type(self), (self.to_dict(),))
+
+    def __repr__(self):
+        return "<{0} {1}>".format(type(self).__name__,
+                                  self.get(self._fields[0]))
+
+    def to_dict(self):
+        """Return the record as the dict botocore would have returned."""
+        result = {}
+        for name in self:
+            value = self._raw(name)
+            if isinstance(value, TagMap):
+                result[name] = value.to_list()
+            else:
+                result[name] = _unpack(value)
+        return result
+
+
+def _field(name):
+    def get(self):
+        try:
+            return self[name]
+        except KeyError:
+            return None
+    get.__name__ = name
+    return property(get, doc="The {0} field, or None.".format(name))
+
+
+def _record_class(name, fields):
+    slot_names = dict((field, '_' + field) for field in fields)
+    namespace = {
+        '__slots__': tuple(slot_names[field] for field in fields),
+        '_fields': fields,
+        '_slot_names': slot_names,
+        '__module__': __name__,
+        '__doc__': "Compact form of one item of a {0} result.".format(
+            name.replace('Record', '')),
+    }
+    for field in fields:
+        namespace[field] = _field(field)
+    return type(name, (Record,), namespace)
+
+
+InstanceRecord = _record_class('InstanceRecord', (
+    'InstanceId', 'ImageId', 'State', 'PrivateDnsName', 'PublicDnsName',
+    'StateTransitionReason', 'KeyName', 'AmiLaunchIndex', 'ProductCodes',
+    'InstanceType', 'LaunchTime', 'Placement', 'KernelId', 'RamdiskId',
+    'Platform', 'Monitoring', 'SubnetId', 'VpcId', 'PrivateIpAddress',
+    'PublicIpAddress', 'StateReason', 'Architecture', 'RootDeviceType',
+    'RootDeviceName', 'BlockDeviceMappings', 'VirtualizationType',
+    'InstanceLifecycle', 'SpotInstanceRequestId', 'ClientToken', 'Tags',
+    'SecurityGroups', 'SourceDestCheck', 'Hypervisor', 'NetworkInterfaces',
+    'IamInstanceProfile', 'EbsOptimized', 'SriovNetSupport'))
+
+VolumeRecord = _record_class('VolumeRecord', (
+    'VolumeId', 'Size', 'SnapshotId', 'AvailabilityZone', 'State',
+    'CreateTime', 'Attachments', 'Tags', 'VolumeType', 'Iops'))
+
+SnapshotRecord = _record_class('SnapshotRecord', (
+    'SnapshotId', 'VolumeId', 'State', 'StartTime', 'Progress', 'OwnerId',
+    'Description', 'VolumeSize', 'OwnerAlias', 'Tags'))
+
+ImageRecord = _record_class('ImageRecord', (
+    'ImageId', 'ImageLocation', 'State', 'OwnerId', 'Public', 'ProductCodes',
+    'Architecture', 'ImageType', 'KernelId', 'RamdiskId', 'Platform',
+    'SriovNetSupport', 'StateReason', 'ImageOwnerAlias', 'Name',
+    'Description', 'RootDeviceType', 'RootDeviceName', 'BlockDeviceMappings',
+    'VirtualizationType', 'Tags', 'Hypervisor'))
+
+
+def compact(record_class, items, stream=False):
+    """Convert Describe result items to records: an iterator if stream is
+    true, else a list."""
+    records = (record_class(item) for item in items)
+    return records if stream else list(records)
@@ -0,0 +1,167 @@
+"""Retry policy for throttled and transient AWS errors"""
+import random
+import threading
+import time
+
+THROTTLE = 'throttle'
+TRANSIENT = 'transient'
+
+THROTTLING_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestLimitExceeded',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'SlowDown',
+    'BandwidthLimitExceeded',
+])
+
+TRANSIENT_CODES = frozenset([
+    'InternalError',
+    'InternalFailure',
+    'ServiceUnavailable',
+    'Unavailable',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'PriorRequestNotComplete',
+])
+
+
+class AdaptiveRate(object):
+    """Client-side send rate for one service. Sending is unrestricted until
+    AWS throttles a request; the rate is then cut to a fraction of what was
+    being sent (multiplicative decrease) and grows back by roughly
+    `increase` requests per second while calls succeed (additive increase).
+    Once it is back well above the rate that was throttled, the limit is
+    lifted again.
+
+    Requests in flight when the rate is cut were sent at the old rate, so
+    throttles of requests sent before the last cut do not cut it again.
+    """
+    def __init__(self, min_rate=0.5, decrease=0.5, increase=1.0,
+                 clock=time.time, sleep=time.sleep):
+        self.min_rate = min_rate
+        self.decrease = decrease
+        self.increase = increase
+        self.rate = None
+        self._ceiling = None
+        self._next_send = 0.0
+        self._window_start = None
+        self._window_count = 0
+        self._measured = None
+        self._last_decrease = None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until another request may be sent, and return the time it
+        is sent at, to pass to throttled()."""
+        with self._lock:
+            now = self._clock()
+            self._measure(now)
+            if self.rate is None:
+                return now
+            wait = self._next_send - now
+            self._next_send = max(now, self._next_send) + 1.0 / self.rate
+        if wait > 0:
+            self._sleep(wait)
+            return now + wait
+        return now
+
+    def _measure(self, now):
+        # Count sends over one-second windows so the first throttle can be
+        # answered with a rate based on what was actually being sent.
+        if self._window_start is None or now - self._window_start >= 1.0:
+            if self._window_start is not None:
+                elapsed = max(now - self._window_start, 1.0)
+                self._measured = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+
+    def throttled(self, sent_at=None):
+        """Cut the rate after a request sent at sent_at (as returned by
+        acquire()) was throttled."""
+        with self._lock:
+            if sent_at is not None and self._last_decrease is not None and \
+                    sent_at < self._last_decrease:
+                return
+            self._last_decrease = self._clock()
+            current = self.rate
+            if current is None:
+                current = max(self._measured or 0, self._window_count,
+                              self.min_rate)
+            self._ceiling = current
+            self.rate = max(self.min_rate, current * self.decrease)
+
+    def succeeded(self):
+        if self.rate is None:
+            return
+        with self._lock:
+            if self.rate is None:
+                return
+            self.rate += self.increase / self.rate
+            if self.rate >= 2 * self._ceiling:
+                self.rate = None
+
+
+class RetryPolicy(object):
+    """Decides whether a failed call is retried and how long to wait first.
+
+    Throttling errors, transient server errors (5xx) and dropped
+    connections are retried up to max_attempts in total, sleeping a random
+    time between zero and an exponentially growing cap ("full jitter")
+    between attempts. With adaptive=True, each service also gets an
+    AdaptiveRate that slows sending down after throttles.
+    """
+    def __init__(self, max_attempts=5, base_delay=0.1, max_delay=20.0,
+                 adaptive=True, throttling_codes=THROTTLING_CODES,
+                 transient_codes=TRANSIENT_CODES, sleep=time.sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.adaptive = adaptive
+        self.throttling_codes = throttling_codes
+        self.transient_codes = transient_codes
+        self.sleep = sleep
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    def classify(self, status_code, code):
+        """Return THROTTLE, TRANSIENT or None for a failed response."""
+        if code in self.throttling_codes:
+            return THROTTLE
+        if code in self.transient_codes or (status_code or 0) >= 500:
+            return TRANSIENT
+        return None
+
+    def classify_exception(self, exception):
+        """Return TRANSIENT for an exception raised because a connection
+        failed or dropped, or None."""
+        from botocore.vendored.requests import ConnectionError
+        from botocore.vendored.requests.packages.urllib3.exceptions import \
+            ClosedPoolError
+        if isinstance(exception, (ConnectionError, ClosedPoolError)):
+            return TRANSIENT
+        return None
+
+    def delay(self, attempt):
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def rate(self, service_name, region):
+        """Return the AdaptiveRate for a service, or None if disabled."""
+        if not self.adaptive:
+            return None
+        key = (service_name, region)
+        rate = self._rates.get(key)
+        if rate is None:
+            with self._lock:
+                rate = self._rates.setdefault(key,
+                                              AdaptiveRate(sleep=self.sleep))
+        return rate
@@ -1,4 +1,5 @@
 from acky.api import AwsApiClient
+from acky.trace import traced
 try:
     from urllib import parse
 except ImportError:
@@ -33,10 +34,11 @@ class S3(AwsApiClient):
     """Interface for managing S3 buckets. (API Version 2006-03-01)"""
     service_name = "s3"
 
-    def get(self, url=None, delimiter="/"):
+    def get(self, url=None, delimiter="/", stream=False):
         """Path is an s3 url. Ommiting the path or providing "s3://" as the
         path will return a list of all buckets. Otherwise, all subdirectories
-        and their contents will be shown.
+        and their contents will be shown. Set stream=True to get an iterator
+        that follows pagination and yields objects as pages arrive.
         """
         params = {'Delimiter': delimiter}
         bucket, obj_key = _parse_url(url)
@@ -44,11 +46,15 @@ class S3(AwsApiClient):
         if bucket:
             params['Bucket'] = bucket
         else:
-            return self.call("ListBuckets", response_data_key="Buckets")
+            buckets = self.call("ListBuckets", response_data_key="Buckets")
+            return iter(buckets or ()) if stream else buckets
 
         if obj_key:
             params['Prefix'] = obj_key
 
+        if stream:
+            return self._iter_objects(bucket, params)
+
         objects = self.call("ListObjects", response_data_key="Contents",
                             **params)
         if objects:
@@ -57,6 +63,12 @@ class S3(AwsApiClient):
 
         return objects
 
+    def _iter_objects(self, bucket, params):
+        for obj in self.iter_call("ListObjects", response_data_key="Contents",
+                                  **params):
+            obj['url'] = "s3://{0}/{1}".format(bucket, obj['Key'])
+            yield obj
+
     def create(self, url):
         """Create a bucket, directory, or empty file."""
         bucket, obj_key = _parse_url(url)
@@ -72,6 +84,7 @@ class S3(AwsApiClient):
 
         return self.call("CreateBucket", bucket=target)
 
+    @traced
     def destroy(self, url, recursive=False):
         """Destroy a bucket, directory, or file. Specifying recursive=True
         recursively deletes all subdirectories and files."""
@@ -124,6 +137,7 @@ class S3(AwsApiClient):
         }
         return self.call("CopyObject", **params)
 
+    @traced
     def move(self, src_url, dst_url):
         """Copy a single S3 object to another S3 location, then delete the
         original object."""
@@ -24,7 +24,7 @@ class SQS(SQSApiClient):
 
 
 class QueuesCollection(AwsCollection, SQSApiClient):
-    def get(self, queue_name=None, prefix_match=False):
+    def get(self, queue_name=None, prefix_match=False, stream=False):
         # returns [QueueUrl, ...]
         # ListQueues, GetQueueUrl (no native filter)
         params = {}
@@ -34,10 +34,16 @@ class QueuesCollection(AwsCollection, SQSApiClient):
             else:
                 # if it's already a URL, just send it back as-is
                 if "://" in queue_name:
-                    return [queue_name]
-                params["queue_name"] = queue_name
-                return [self.call("GetQueueUrl", response_data_key="QueueUrl",
-                        **params)]
+                    urls = [queue_name]
+                else:
+                    params["queue_name"] = queue_name
+                    urls = [self.call("GetQueueUrl",
+                                      response_data_key="QueueUrl",
+                                      **params)]
+                return iter(urls) if stream else urls
+        if stream:
+            return self.iter_call("ListQueues", response_data_key="QueueUrls",
+                                  **params)
         return self.call("ListQueues", response_data_key="QueueUrls", **params)
 
     def get_attributes(self, queue_url):
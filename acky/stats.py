@@ -0,0 +1,153 @@
+"""Per-operation call statistics for AWS API clients"""
+import bisect
+import json
+import logging
+import threading
+
+# Latency histogram bucket upper bounds in seconds: 1ms to ~2min, 20% apart
+LATENCY_BUCKETS = tuple(0.001 * 1.2 ** n for n in range(65))
+
+
+class Histogram(object):
+    """Fixed-bucket latency histogram. Percentiles are reported as the upper
+    bound of the bucket they fall in, so they are accurate to about 20%."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index == len(self.buckets):
+                    return self.max
+                return min(self.buckets[index], self.max)
+        return self.max
+
+
+class OperationStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.errors = {}
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = Histogram()
+
+    def snapshot(self):
+        latency = self.latency
+        return {
+            'calls': self.calls,
+            'errors': dict(self.errors),
+            'retries': self.retries,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'latency': {
+                'mean': latency.total / latency.count if latency.count
+                else None,
+                'max': latency.max,
+                'p50': latency.percentile(50),
+                'p95': latency.percentile(95),
+                'p99': latency.percentile(99),
+            },
+        }
+
+
+class StatsRegistry(object):
+    """Collects OperationStats by (service, operation) for every client of
+    an AWS object. Exporters are callables that receive snapshot() when
+    export() is called; see log_exporter() and json_exporter().
+    """
+    def __init__(self, exporters=None):
+        self.exporters = list(exporters or [])
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, service_name, operation):
+        key = (service_name, operation)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats.setdefault(key, OperationStats())
+        return stats
+
+    def record_retry(self, service_name, operation):
+        with self._lock:
+            self._get(service_name, operation).retries += 1
+
+    def record_call(self, service_name, operation, latency, error_code=None,
+                    request_bytes=0, response_bytes=0):
+        """Record a finished call; error_code is set if it failed."""
+        with self._lock:
+            stats = self._get(service_name, operation)
+            stats.calls += 1
+            stats.latency.record(latency)
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            if error_code is not None:
+                stats.errors[error_code] = stats.errors.get(error_code, 0) + 1
+
+    def get(self, service_name, operation):
+        """Return a snapshot of one operation's stats, or None."""
+        with self._lock:
+            stats = self._stats.get((service_name, operation))
+            return stats.snapshot() if stats is not None else None
+
+    def snapshot(self):
+        """Return {service: {operation: stats}} for everything recorded."""
+        with self._lock:
+            result = {}
+            for (service_name, operation), stats in self._stats.items():
+                result.setdefault(service_name, {})[operation] = \
+                    stats.snapshot()
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def export(self):
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            exporter(snapshot)
+        return snapshot
+
+
+def log_exporter(logger=None, level=logging.INFO):
+    """Exporter that logs one line per operation."""
+    logger = logger or logging.getLogger(__name__)
+
+    def export(snapshot):
+        for service_name, operations in sorted(snapshot.items()):
+            for operation, stats in sorted(operations.items()):
+                latency = stats['latency']
+                logger.log(level, "%s.%s calls=%d errors=%d retries=%d "
+                           "p50=%s p95=%s p99=%s", service_name, operation,
+                           stats['calls'], sum(stats['errors'].values()),
+                           stats['retries'], latency['p50'], latency['p95'],
+                           latency['p99'])
+    return export
+
+
+def json_exporter(stream):
+    """Exporter that writes each snapshot to stream as a line of JSON."""
+    def export(snapshot):
+        stream.write(json.dumps(snapshot, sort_keys=True))
+        stream.write("\n")
+    return export
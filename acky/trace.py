@@ -0,0 +1,263 @@
+"""Call-tree tracing of acky workflows
+
+Inside ``with aws.trace() as t:``, every API call and every multi-step
+method (those decorated with traced(), such as S3.move()) is recorded as a
+Span with its parameters, start and end times, outcome and nested spans.
+Spans nest per thread; calls made from other threads (e.g. by
+across_regions()) become root spans of their own, unless the work handed to
+those threads is wrapped with Tracer.propagate(), as control() does. The
+result can be written out in Chrome's trace event format and opened in
+chrome://tracing or Perfetto to see which round trips run one after
+another::
+
+    with aws.trace() as t:
+        aws.s3.destroy('s3://bucket/logs', recursive=True)
+    with open('destroy.json', 'w') as fp:
+        t.dump(fp)
+"""
+import functools
+import os
+import re
+import threading
+import time
+
+# Parameters whose values are never recorded.
+REDACTED = re.compile(r'Password|Secret|SessionToken|PrivateKey|KeyMaterial|'
+                      r'UserData|CustomerKey', re.IGNORECASE)
+MAX_VALUE_LENGTH = 200
+
+
+def redact(params):
+    """Return a copy of params that is safe to record: secrets are masked,
+    request bodies and long values are summarized."""
+    result = {}
+    for name, value in params.items():
+        if REDACTED.search(name):
+            result[name] = '<redacted>'
+        else:
+            result[name] = _summarize(value)
+    return result
+
+
+def _summarize(value):
+    if hasattr(value, 'read'):
+        return '<{0}>'.format(type(value).__name__)
+    if isinstance(value, bytes):
+        return '<{0} bytes>'.format(len(value))
+    if isinstance(value, dict):
+        return redact(value)
+    if isinstance(value, (list, tuple)):
+        return [_summarize(v) for v in value]
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    value = str(value)
+    if len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + '...'
+    return value
+
+
+class Span(object):
+    """One traced call. outcome is 'ok', or the AWS error code or exception
+    class name it failed with."""
+    def __init__(self, name, category, args, parent=None):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.parent = parent
+        self.children = []
+        self.events = []
+        self.thread = threading.current_thread().ident
+        self.start = time.time()
+        self.end = None
+        self.outcome = None
+
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def __repr__(self):
+        return "<Span {0}.{1} {2}>".format(self.category, self.name,
+                                           self.outcome)
+
+
+class Trace(object):
+    """Spans recorded by one `with aws.trace()` block."""
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.spans = []
+        self.start = None
+        self.end = None
+        self._lock = threading.Lock()
+
+    @property
+    def roots(self):
+        return [span for span in self.spans if span.parent is None]
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def __enter__(self):
+        self.start = time.time()
+        self.tracer._start(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer._stop(self)
+        self.end = time.time()
+
+    def to_chrome_trace(self):
+        """Return the trace as a Chrome trace event dict."""
+        pid = os.getpid()
+
+        def micros(t):
+            return int((t - self.start) * 1e6)
+
+        events = []
+        for span in self.spans:
+            end = span.end if span.end is not None else self.end
+            args = dict(span.args)
+            args['outcome'] = span.outcome
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': micros(span.start),
+                'dur': micros(end) - micros(span.start),
+                'pid': pid,
+                'tid': span.thread,
+                'args': args,
+            })
+            for timestamp, name, args in span.events:
+                events.append({
+                    'name': name,
+                    'cat': span.category,
+                    'ph': 'i',
+                    's': 't',
+                    'ts': micros(timestamp),
+                    'pid': pid,
+                    'tid': span.thread,
+                    'args': args,
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, fp):
+        """Write the Chrome trace event JSON to a file object."""
+        import json
+        json.dump(self.to_chrome_trace(), fp)
+
+
+class _SpanContext(object):
+    def __init__(self, tracer, span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self):
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end = time.time()
+        if exc is None:
+            span.outcome = 'ok'
+        else:
+            span.outcome = getattr(exc, 'code', None) or exc_type.__name__
+        self.tracer._stack().pop()
+
+
+class Tracer(object):
+    """Records spans into the active Trace, if there is one. Each AWS object
+    has a Tracer, shared by its clients and by for_region() copies."""
+    def __init__(self):
+        self._trace = None
+        self._local = threading.local()
+
+    @property
+    def active(self):
+        return self._trace is not None
+
+    def trace(self):
+        return Trace(self)
+
+    def _start(self, trace):
+        if self._trace is not None:
+            raise RuntimeError("a trace is already being recorded")
+        self._trace = trace
+
+    def _stop(self, trace):
+        if self._trace is trace:
+            self._trace = None
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        """Return the innermost open span in this thread, or None."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def span(self, name, category, params=None, **args):
+        """Context manager recording a span. params are redacted; other
+        keyword arguments are recorded as given."""
+        trace = self._trace
+        parent = self.current()
+        if params:
+            args['params'] = redact(params)
+        span = Span(name, category, args, parent)
+        if parent is not None:
+            parent.children.append(span)
+        if trace is not None:
+            trace._add(span)
+        self._stack().append(span)
+        return _SpanContext(self, span)
+
+    def propagate(self, fn):
+        """Wrap fn so that spans it records, in whatever thread it runs,
+        nest under the span that is current here."""
+        parent = self.current()
+        if parent is None:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stack = self._stack()
+            stack.append(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stack.pop()
+        return wrapper
+
+    def event(self, name, **args):
+        """Record an instant event, e.g. a retry, on the current span."""
+        span = self.current()
+        if span is not None:
+            span.events.append((time.time(), name, args))
+
+    def annotate(self, **args):
+        """Add arguments to the current span."""
+        span = self.current()
+        if span is not None:
+            span.args.update(args)
+
+
+def traced(method):
+    """Record calls to an AwsApiClient method as spans, so the API calls it
+    makes show up nested under it."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        tracer = getattr(self, '_tracer', None)
+        if tracer is None or not tracer.active:
+            return method(self, *args, **kwargs)
+        name = "{0}.{1}".format(type(self).__name__, method.__name__)
+        params = dict(kwargs)
+        if args:
+            params['args'] = list(args)
+        with tracer.span(name, self.service_name, params):
+            return method(self, *args, **kwargs)
+    return wrapper
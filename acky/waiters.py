@@ -0,0 +1,168 @@
+"""Waiting for many resources to reach a state with batched Describe calls"""
+from concurrent.futures import Future
+import threading
+import time
+
+# EC2 accepts up to 200 values per filter.
+BATCH_SIZE = 200
+
+
+class WaiterError(Exception):
+    """A resource did not reach the state waited for."""
+    def __init__(self, resource_id, message):
+        super(WaiterError, self).__init__(
+            "{0}: {1}".format(resource_id, message))
+        self.resource_id = resource_id
+
+
+class WaitFailed(WaiterError):
+    """A resource reached a state it cannot leave for the one waited for,
+    e.g. an instance was terminated while waiting for it to run."""
+    def __init__(self, resource_id, state, item):
+        super(WaitFailed, self).__init__(resource_id,
+                                         "reached state {0}".format(state))
+        self.state = state
+        self.item = item
+
+
+class WaitTimeout(WaiterError):
+    def __init__(self, resource_id, timeout):
+        super(WaitTimeout, self).__init__(
+            resource_id, "still waiting after {0}s".format(timeout))
+
+
+class WaitResults(dict):
+    """Results of Waiter.wait() keyed by resource ID: the resource as last
+    described. Resources that failed or timed out are left out and their
+    WaiterErrors kept in the errors dict."""
+    def __init__(self):
+        super(WaitResults, self).__init__()
+        self.errors = {}
+
+
+class Waiter(object):
+    """Polls many resources until each reaches the target state.
+
+    describe(ids) returns the current records for a list of IDs (missing
+    IDs, e.g. ones not yet visible after a create, are polled again), and
+    state(record) gives a record's state. Each poll describes every
+    pending ID in calls of up to batch_size IDs, and drops the ones that
+    reached target or one of the failures states. Polls are `interval`
+    seconds apart while resources keep finishing; after a poll in which
+    none did, the interval grows by `backoff` up to max_interval.
+
+    callback(id, record, error) is called as each resource finishes, with
+    error None on success or a WaiterError.
+    """
+    def __init__(self, describe, id_key, state, target, failures=(),
+                 timeout=600, interval=2, max_interval=30, backoff=1.5,
+                 batch_size=BATCH_SIZE, callback=None, clock=time.time,
+                 sleep=time.sleep):
+        self.describe = describe
+        self.id_key = id_key
+        self.state = state
+        self.target = target
+        self.failures = failures
+        self.timeout = timeout
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.callback = callback
+        self.polls = 0
+        self._clock = clock
+        self._sleep = sleep
+
+    def wait(self, ids):
+        """Block until every ID has finished or the timeout passes, and
+        return a WaitResults."""
+        return self._wait(ids, self.callback)
+
+    def start(self, ids):
+        """Wait in a background thread, and return a dict of Futures by ID
+        that resolve to each resource's record or WaiterError."""
+        futures = dict((resource_id, Future()) for resource_id in ids)
+
+        def finished(resource_id, item, error):
+            if self.callback is not None:
+                self.callback(resource_id, item, error)
+            if error is None:
+                futures[resource_id].set_result(item)
+            else:
+                futures[resource_id].set_exception(error)
+
+        def run():
+            try:
+                self._wait(list(futures), finished)
+            except Exception as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return futures
+
+    def _describe(self, ids):
+        items = {}
+        for start in range(0, len(ids), self.batch_size):
+            for item in self.describe(ids[start:start + self.batch_size]) \
+                    or ():
+                items[item[self.id_key]] = item
+        self.polls += 1
+        return items
+
+    def _wait(self, ids, callback):
+        results = WaitResults()
+        pending = []
+        seen = set()
+        for resource_id in ids:
+            if resource_id not in seen:
+                seen.add(resource_id)
+                pending.append(resource_id)
+        deadline = None
+        if self.timeout is not None:
+            deadline = self._clock() + self.timeout
+        interval = self.interval
+
+        def finish(resource_id, item, error):
+            if error is None:
+                results[resource_id] = item
+            else:
+                results.errors[resource_id] = error
+            if callback is not None:
+                callback(resource_id, item, error)
+
+        while pending:
+            items = self._describe(pending)
+            waiting = []
+            for resource_id in pending:
+                item = items.get(resource_id)
+                state = self.state(item) if item is not None else None
+                if state == self.target:
+                    finish(resource_id, item, None)
+                elif state in self.failures:
+                    finish(resource_id, item,
+                           WaitFailed(resource_id, state, item))
+                else:
+                    waiting.append(resource_id)
+            progressed = len(waiting) < len(pending)
+            pending = waiting
+            if not pending:
+                break
+            now = self._clock()
+            if deadline is not None and now >= deadline:
+                for resource_id in pending:
+                    finish(resource_id, items.get(resource_id),
+                           WaitTimeout(resource_id, self.timeout))
+                break
+            if progressed:
+                interval = self.interval
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+            if deadline is not None:
+                self._sleep(min(interval, deadline - now))
+            else:
+                self._sleep(interval)
+        return results
@@ -0,0 +1,38 @@
+"""Measure the per-call overhead that AwsApiClient.call() adds on top of
+botocore's Operation.call(), using an endpoint that never touches the network.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_call
+"""
+from __future__ import print_function
+import timeit
+
+from benchmarks.harness import AWS, StubEndpoint
+
+NUMBER = 2000
+
+
+def main():
+    client = AWS('us-east-1').ec2.VPCs
+    client._endpoint = StubEndpoint({'Vpcs': []})
+    service = client._service
+    endpoint = client._endpoint
+    operation = service.get_operation('DescribeVpcs')
+
+    cases = (
+        ('botocore', lambda: operation.call(endpoint)),
+        ('lookup+call', lambda: service.get_operation('DescribeVpcs')
+         .call(endpoint)),
+        ('acky', lambda: client.call('DescribeVpcs',
+                                     response_data_key='Vpcs')),
+    )
+    for name, fn in cases:
+        fn()
+        seconds = min(timeit.repeat(fn, number=NUMBER, repeat=3))
+        print("{0:>12}: {1:8.1f} us/call".format(
+            name, seconds / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Measure the cost of building collection clients, e.g. ``aws.ec2.Instances``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_clients
+"""
+from __future__ import print_function
+import timeit
+
+from benchmarks.harness import AWS
+
+NUMBER = 200
+
+
+def uncached(aws):
+    aws.invalidate()
+    return aws.ec2.Instances
+
+
+def cached(aws):
+    return aws.ec2.Instances
+
+
+def main():
+    aws = AWS('us-east-1')
+    for name, fn in (('uncached', uncached), ('cached', cached)):
+        fn(aws)
+        seconds = min(timeit.repeat(lambda: fn(aws), number=NUMBER, repeat=3))
+        print("{0:>10}: {1:10.1f} us/access".format(
+            name, seconds / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
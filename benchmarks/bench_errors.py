@@ -0,0 +1,51 @@
+"""Measure AWS error parsing: the streaming extract_aws_error() against the
+DOM-based implementation it replaced, on a small error and on a large
+batch-failure body.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_errors
+"""
+from __future__ import print_function
+import timeit
+from xml.dom.minidom import parseString
+
+from acky.api import extract_aws_error
+
+NUMBER = 200
+
+SMALL = ("<Response><Errors><Error><Code>RequestLimitExceeded</Code>"
+         "<Message>Request limit exceeded.</Message></Error></Errors>"
+         "<RequestID>5f4a8a3b</RequestID></Response>")
+
+LARGE = "<Response><Errors>{0}</Errors><RequestID>5f4a8a3b</RequestID>" \
+    "</Response>".format("".join(
+        "<Error><Code>InvalidInstanceID.NotFound</Code><Message>"
+        "The instance ID 'i-{0:08x}' does not exist</Message>"
+        "</Error>".format(n) for n in range(2000)))
+
+
+def dom_extract_aws_error(xml_string):
+    dom = parseString(xml_string)
+    for tag in dom.getElementsByTagName('Error'):
+        children = [n.tagName for n in tag.childNodes
+                    if n.nodeType != n.TEXT_NODE]
+        if 'Code' in children and 'Message' in children:
+            code = tag.getElementsByTagName('Code')[0].firstChild.data
+            message = tag.getElementsByTagName('Message')[0].firstChild.data
+            return code, message
+
+
+def main():
+    for body_name, body in (('small', SMALL), ('large', LARGE)):
+        assert extract_aws_error(body) == dom_extract_aws_error(body)
+        for name, fn in (('dom', dom_extract_aws_error),
+                         ('streaming', extract_aws_error)):
+            seconds = min(timeit.repeat(lambda: fn(body), number=NUMBER,
+                                        repeat=3))
+            print("{0:>6} {1:>10}: {2:10.1f} us/parse".format(
+                body_name, name, seconds / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
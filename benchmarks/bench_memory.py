@@ -0,0 +1,123 @@
+"""Measure the memory held by a large DescribeInstances result as botocore
+dicts and as acky.records.InstanceRecord objects.
+
+The instances are built the way botocore parses them, with block devices,
+network interfaces, security groups and tags, and a tag set shared by
+every 50 instances, as an autoscaled fleet would have.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_memory [count]
+"""
+from __future__ import print_function
+import datetime
+import gc
+import sys
+import time
+import tracemalloc
+
+from acky.records import InstanceRecord
+
+
+def instance(n):
+    ip = '10.{0}.{1}.{2}'.format(n // 65536, n // 256 % 256, n % 256)
+    group = n // 50
+    launched = datetime.datetime(2014, 6, 1) + datetime.timedelta(seconds=n)
+    return {
+        'InstanceId': 'i-{0:08x}'.format(n),
+        'ImageId': 'ami-{0:08x}'.format(group % 20),
+        'State': {'Code': 16, 'Name': 'running'},
+        'PrivateDnsName': 'ip-{0}.ec2.internal'.format(ip.replace('.', '-')),
+        'PublicDnsName': '',
+        'StateTransitionReason': '',
+        'KeyName': 'deploy',
+        'AmiLaunchIndex': 0,
+        'ProductCodes': [],
+        'InstanceType': 'm3.large',
+        'LaunchTime': launched,
+        'Placement': {'AvailabilityZone': 'us-east-1' + 'abcd'[n % 4],
+                      'GroupName': '', 'Tenancy': 'default'},
+        'Monitoring': {'State': 'disabled'},
+        'SubnetId': 'subnet-{0:08x}'.format(n % 16),
+        'VpcId': 'vpc-00000001',
+        'PrivateIpAddress': ip,
+        'Architecture': 'x86_64',
+        'RootDeviceType': 'ebs',
+        'RootDeviceName': '/dev/sda1',
+        'BlockDeviceMappings': [
+            {'DeviceName': device,
+             'Ebs': {'VolumeId': 'vol-{0:08x}'.format(n * 2 + i),
+                     'Status': 'attached',
+                     'AttachTime': datetime.datetime(2014, 6, 1),
+                     'DeleteOnTermination': True}}
+            for i, device in enumerate(('/dev/sda1', '/dev/sdf'))],
+        'VirtualizationType': 'hvm',
+        'ClientToken': '',
+        'Tags': [{'Key': 'Name', 'Value': 'web-{0}'.format(group)},
+                 {'Key': 'env', 'Value': 'prod'},
+                 {'Key': 'aws:autoscaling:groupName',
+                  'Value': 'web-asg-{0}'.format(group)}],
+        'SecurityGroups': [{'GroupName': 'web', 'GroupId': 'sg-00000001'}],
+        'SourceDestCheck': True,
+        'Hypervisor': 'xen',
+        'NetworkInterfaces': [{
+            'NetworkInterfaceId': 'eni-{0:08x}'.format(n),
+            'SubnetId': 'subnet-{0:08x}'.format(n % 16),
+            'VpcId': 'vpc-00000001',
+            'Description': '',
+            'OwnerId': '123456789012',
+            'Status': 'in-use',
+            'MacAddress': '0a:00:00:{0:02x}:{1:02x}:{2:02x}'.format(
+                n >> 16 & 255, n >> 8 & 255, n & 255),
+            'PrivateIpAddress': ip,
+            'SourceDestCheck': True,
+            'Groups': [{'GroupName': 'web', 'GroupId': 'sg-00000001'}],
+            'Attachment': {'AttachmentId': 'eni-attach-{0:08x}'.format(n),
+                           'DeviceIndex': 0, 'Status': 'attached',
+                           'DeleteOnTermination': True},
+            'PrivateIpAddresses': [{'PrivateIpAddress': ip, 'Primary': True}],
+        }],
+        'EbsOptimized': False,
+    }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    result = build()
+    seconds = time.time() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, memory
+
+
+def main(count=50000):
+    # Both are built from fresh copies of the same input, as if just
+    # parsed; memory counts only what each keeps.
+    source = [instance(n) for n in range(count)]
+    for name, build in (
+            ('dicts', lambda: [_copy(i) for i in source]),
+            ('compact', lambda: [InstanceRecord(_copy(i)) for i in source])):
+        result, seconds, memory = measure(build)
+        print("{0:>8}: {1:6d} instances {2:8.1f} ms {3:8.1f} MB "
+              "({4:.0f} bytes each)".format(name, len(result), seconds * 1e3,
+                                            memory / 1024.0 / 1024,
+                                            memory / float(count)))
+        del result
+
+
+def _copy(value):
+    """A deep copy, so the dicts measured are not shared with source."""
+    if isinstance(value, dict):
+        return dict((k, _copy(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, str):
+        # Parsed strings are fresh objects, not shared constants.
+        return ''.join(value)
+    return value
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,48 @@
+"""Measure the time and memory taken to build an EC2 client in every region,
+with a botocore session per region and with one shared session (through
+for_region() or the process-wide session pool).
+
+Run from the repository root::
+
+    python -m benchmarks.bench_regions
+"""
+from __future__ import print_function
+import gc
+import time
+import tracemalloc
+
+from benchmarks.harness import AWS
+
+
+def separate(regions):
+    return [AWS(region).ec2.Instances for region in regions]
+
+
+def shared(regions):
+    aws = AWS(regions[0])
+    return [aws.for_region(region).ec2.Instances for region in regions]
+
+
+def pooled(regions):
+    return [AWS(region, session_pool=True).ec2.Instances
+            for region in regions]
+
+
+def main():
+    regions = sorted(AWS('us-east-1').ec2._service.region_names)
+    for name, fn in (('separate', separate), ('for_region', shared),
+                     ('pooled', pooled)):
+        gc.collect()
+        tracemalloc.start()
+        start = time.time()
+        clients = fn(regions)
+        seconds = time.time() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print("{0:>10}: {1:3d} regions {2:8.1f} ms {3:8.1f} MB".format(
+            name, len(clients), seconds * 1e3, memory / 1024.0 / 1024))
+        del clients
+
+
+if __name__ == '__main__':
+    main()
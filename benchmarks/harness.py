@@ -0,0 +1,30 @@
+"""Helpers for running acky against tests.server.StubAWSServer.
+
+Importing this module sets dummy AWS credentials, so benchmark modules get
+AWS and the stubs from here rather than from acky.aws and tests."""
+import time
+
+from botocore.handlers import fix_s3_host
+from acky.aws import AWS
+# Importing tests mocks acky.aws.AWS (see tests.TestS3), so this comes after
+# AWS is bound above. tests.server also sets the dummy credentials.
+from tests.server import StubAWSServer, stubbed  # noqa
+from tests.stub import StubEndpoint  # noqa
+
+
+def make_aws(region='us-east-1', **options):
+    """Return an AWS object whose S3 requests use path-style addressing, so
+    they reach the stub instead of bucket.s3.amazonaws.com."""
+    aws = AWS(region, **options)
+    aws.session.unregister('before-auth.s3', fix_s3_host)
+    return aws
+
+
+def best_of(fn, repeat=3):
+    """Run fn repeat times and return the shortest wall-clock time."""
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        fn()
+        times.append(time.time() - start)
+    return min(times)
@@ -0,0 +1,338 @@
+"""Benchmark suite run against a local stub of EC2, SQS and S3.
+
+Measures acky's import time, per-call overhead, throughput from many
+threads, pagination throughput, S3 transfer rates and SQS message rates,
+and writes the results as JSON. Results can be compared with an earlier
+run, or with another commit, to catch regressions.
+
+Run from the repository root::
+
+    python -m benchmarks.run -o after.json
+    python -m benchmarks.run --baseline before.json
+    python -m benchmarks.run --rev master
+    python -m benchmarks.run --compare before.json after.json
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+from benchmarks.harness import (StubAWSServer, StubEndpoint, best_of,
+                                make_aws, stubbed)
+import botocore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _result(value, unit, better):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def bench_import(quick):
+    """Milliseconds that importing acky.aws adds to interpreter startup."""
+    import acky
+    path = os.path.dirname(os.path.dirname(os.path.abspath(acky.__file__)))
+    repeat = 5 if quick else 20
+
+    def startup(code):
+        return best_of(lambda: subprocess.check_call([sys.executable, '-c',
+                                                      code], cwd=path),
+                       repeat)
+
+    seconds = startup('import acky.aws') - startup('pass')
+    return {'import_time': _result(seconds * 1e3, 'ms', 'lower')}
+
+
+def bench_call_overhead(aws, quick):
+    """Microseconds acky adds to each call, measured without any I/O."""
+    number = 500 if quick else 2000
+    client = aws.ec2.VPCs
+    client._endpoint = StubEndpoint({'Vpcs': []})
+    operation = client._service.get_operation('DescribeVpcs')
+    endpoint = client._endpoint
+
+    def per_call(fn):
+        fn()
+        return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+    botocore_time = per_call(lambda: operation.call(endpoint))
+    acky_time = per_call(lambda: client.call('DescribeVpcs',
+                                             response_data_key='Vpcs'))
+    return {'call_overhead': _result((acky_time - botocore_time) * 1e6,
+                                     'us', 'lower')}
+
+
+def bench_round_trip(aws, quick):
+    number = 50 if quick else 200
+    client = aws.ec2.VPCs
+    client.get()
+    seconds = best_of(lambda: [client.get() for _ in range(number)])
+    return {'describe_vpcs_round_trip': _result(seconds / number * 1e6, 'us',
+                                                'lower')}
+
+
+def bench_parallel(quick, threads=32):
+    """Calls per second from many threads sharing one AWS object, with the
+    default connection pool and, where supported, one sized to fit."""
+    number = 20 if quick else 100
+    results = {}
+    configs = [('parallel_calls', {})]
+    try:
+        from acky.connections import HttpConfig
+    except ImportError:
+        pass
+    else:
+        configs.append(('parallel_calls_pooled', {'http_config': HttpConfig(
+            max_pool_connections=threads, pool_block=True)}))
+    for name, options in configs:
+        try:
+            # Identical reads would be coalesced into one request.
+            aws = make_aws(coalesce=False, **options)
+        except TypeError:
+            if options:
+                continue
+            aws = make_aws()
+
+        def work():
+            client = aws.ec2.VPCs
+            for _ in range(number):
+                client.get()
+
+        def run_threads():
+            workers = [threading.Thread(target=work) for _ in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        seconds = best_of(run_threads)
+        results[name] = _result(threads * number / seconds, 'calls/s',
+                                'higher')
+    return results
+
+
+def bench_pagination(aws, quick, instances):
+    try:
+        aws.ec2.Instances.get(stream=True)
+    except TypeError:
+        return {}
+    seconds = best_of(lambda: sum(1 for _ in
+                                  aws.ec2.Instances.get(stream=True)))
+    return {'pagination': _result(instances / seconds, 'items/s', 'higher')}
+
+
+def bench_full_listing(aws, server, quick, latency=0.2):
+    """Seconds to list every instance when each DescribeInstances page takes
+    `latency` seconds to produce, as large pages do on AWS: serially, and
+    sharded by availability zone where supported."""
+    instances = aws.ec2.Instances
+    server.state.page_latency = latency
+    try:
+        results = {'full_listing': _result(
+            best_of(lambda: list(instances.get(stream=True))), 's',
+            'lower')}
+        try:
+            instances.get(shard_by='az')
+        except TypeError:
+            return results
+        results['full_listing_sharded'] = _result(
+            best_of(lambda: instances.get(shard_by='az')), 's', 'lower')
+        return results
+    finally:
+        server.state.page_latency = 0
+
+
+def bench_s3(aws, quick):
+    size = (4 if quick else 16) * 1024 * 1024
+    directory = tempfile.mkdtemp()
+    try:
+        source = os.path.join(directory, 'source')
+        target = os.path.join(directory, 'target')
+        with open(source, 'wb') as fp:
+            fp.write(os.urandom(size))
+        url = 's3://bench/object'
+        upload = best_of(lambda: aws.s3.upload(source, url))
+        download = best_of(lambda: aws.s3.download(url, target))
+        if os.path.getsize(target) != size:
+            raise AssertionError("downloaded object has the wrong size")
+    finally:
+        shutil.rmtree(directory)
+    megabytes = size / (1024.0 * 1024)
+    return {
+        's3_upload': _result(megabytes / upload, 'MB/s', 'higher'),
+        's3_download': _result(megabytes / download, 'MB/s', 'higher'),
+    }
+
+
+def bench_sqs(aws, quick):
+    count = 200 if quick else 1000
+    queue = aws.sqs.Queues.create('bench')
+    messages = aws.sqs.Messages
+
+    def send():
+        for n in range(count):
+            messages.create(queue, 'message {0}'.format(n))
+
+    def receive():
+        received = 0
+        while received < count:
+            batch = messages.get(queue, max_messages=10) or []
+            for message in batch:
+                messages.destroy(queue, message['ReceiptHandle'])
+            received += len(batch)
+
+    send_times = []
+    receive_times = []
+    for _ in range(3):
+        send_times.append(best_of(send, repeat=1))
+        receive_times.append(best_of(receive, repeat=1))
+    return {
+        'sqs_send': _result(count / min(send_times), 'messages/s', 'higher'),
+        'sqs_receive_delete': _result(count / min(receive_times),
+                                      'messages/s', 'higher'),
+    }
+
+
+def run(quick=False, instances=5000):
+    results = bench_import(quick)
+    with StubAWSServer(instances=instances) as server, stubbed(server.url):
+        aws = make_aws()
+        results.update(bench_call_overhead(aws, quick))
+        results.update(bench_round_trip(aws, quick))
+        results.update(bench_parallel(quick))
+        results.update(bench_pagination(aws, quick, instances))
+        results.update(bench_full_listing(aws, server, quick))
+        results.update(bench_s3(aws, quick))
+        results.update(bench_sqs(aws, quick))
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'python': platform.python_version(),
+        'botocore': botocore.__version__,
+        'results': results,
+    }
+
+
+def _git(*args):
+    try:
+        output = subprocess.check_output(('git',) + args, cwd=ROOT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('utf-8').strip()
+
+
+def run_at(rev, quick=False):
+    """Run this suite against the acky package as of another commit and
+    return its results."""
+    directory = tempfile.mkdtemp()
+    try:
+        archive = subprocess.Popen(['git', 'archive', rev, 'acky'], cwd=ROOT,
+                                   stdout=subprocess.PIPE)
+        subprocess.check_call(['tar', '-x', '-C', directory],
+                              stdin=archive.stdout)
+        if archive.wait():
+            raise RuntimeError("git archive {0} failed".format(rev))
+        output = os.path.join(directory, 'results.json')
+        command = [sys.executable, '-m', 'benchmarks.run', '-o', output]
+        if quick:
+            command.append('--quick')
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        # The old acky in `directory` comes first on sys.path.
+        subprocess.check_call(command, cwd=directory, env=env,
+                              stdout=open(os.devnull, 'w'))
+        with open(output) as fp:
+            report = json.load(fp)
+        report['commit'] = _git('rev-parse', rev)
+        return report
+    finally:
+        shutil.rmtree(directory)
+
+
+def compare(baseline, current, threshold=0.1):
+    """Return (rows, regressions), comparing two reports metric by metric.
+    A metric regresses if it is more than threshold (a fraction) worse."""
+    rows = []
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        before = baseline['results'].get(name)
+        if before is None or not before['value']:
+            rows.append((name, None, result['value'], result['unit'], None))
+            continue
+        change = (result['value'] - before['value']) / abs(before['value'])
+        rows.append((name, before['value'], result['value'], result['unit'],
+                     change))
+        worse = -change if result['better'] == 'higher' else change
+        if worse > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_results(report):
+    for name, result in sorted(report['results'].items()):
+        print("{0:>26}: {1:12.1f} {2}".format(name, result['value'],
+                                              result['unit']))
+
+
+def print_comparison(baseline, current, threshold):
+    rows, regressions = compare(baseline, current, threshold)
+    print("{0:>26}  {1:>12}  {2:>12}".format(
+        '', (baseline.get('commit') or 'baseline')[:12],
+        (current.get('commit') or 'current')[:12]))
+    for name, before, after, unit, change in rows:
+        flag = ' REGRESSION' if name in regressions else ''
+        if change is None:
+            print("{0:>26}  {1:>12}  {2:12.1f} {3}".format(name, '-', after,
+                                                           unit))
+        else:
+            print("{0:>26}  {1:12.1f}  {2:12.1f} {3} ({4:+.1%}){5}".format(
+                name, before, after, unit, change, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-o', '--output', help="write results to this file")
+    parser.add_argument('--baseline', help="compare with results in a file")
+    parser.add_argument('--rev', help="compare with another commit")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help="compare two results files without running")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative change counted as a regression")
+    parser.add_argument('--quick', action='store_true',
+                        help="smaller workloads, for smoke testing")
+    parser.add_argument('--instances', type=int, default=5000,
+                        help="instances served by the EC2 stub")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as fp:
+            baseline = json.load(fp)
+        with open(args.compare[1]) as fp:
+            current = json.load(fp)
+        return 1 if print_comparison(baseline, current, args.threshold) else 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+    elif args.rev:
+        baseline = run_at(args.rev, args.quick)
+
+    report = run(args.quick, args.instances)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+    if baseline is None:
+        print_results(report)
+        return 0
+    return 1 if print_comparison(baseline, report, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,26 @@ if sys.version_info <= (2, 7):
 with open('README.rst') as f:
     long_description = f.read()
 
+install_requires = [
+    "botocore == 0.45.0",
+]
+if sys.version_info < (3, 2):
+    install_requires.append("futures")
+
+cmdclass = {}
+if sys.version_info < (3, 5):
+    from setuptools.command.build_py import build_py
+
+    class build_py_without_aio(build_py):
+        """acky.aio uses async/await, which older interpreters cannot
+        compile, so it is left out of the build there."""
+        def find_package_modules(self, package, package_dir):
+            modules = build_py.find_package_modules(self, package,
+                                                    package_dir)
+            return [m for m in modules if m[:2] != ('acky', 'aio')]
+
+    cmdclass['build_py'] = build_py_without_aio
+
 setup(
     name="acky",
     version=__version__,
@@ -19,10 +39,9 @@ setup(
     author="Matthew Wedgwood",
     author_email="mw@rmn.com",
     url="http://github.com/RetailMeNot/acky",
-    install_requires=[
-        "botocore == 0.45.0",
-    ],
-    packages=find_packages(),
+    install_requires=install_requires,
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
+    cmdclass=cmdclass,
     classifiers=[
         "Development Status :: 2 - Pre-Alpha",
         "Intended Audience :: Developers",
@@ -32,6 +51,7 @@ setup(
         "Programming Language :: Python :: 2",
         "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3.5",
         "Topic :: Internet",
     ],
     license="MIT",
@@ -1,10 +1,14 @@
+import threading
+import time
 import unittest
 try:
     from unittest.mock import patch, MagicMock
 except ImportError:
     from mock import patch, MagicMock
-from acky.aws import AWS
+from acky.aws import AWS, SessionPool
 from acky.api import AwsApiClient
+from acky.ratelimit import RateLimiter
+import acky.ec2
 import acky.s3
 import botocore.session
 
@@ -22,6 +26,76 @@ class TestAWS(unittest.TestCase):
         aws.userinfo
         _get_current_user.assert_called()
 
+    @patch('botocore.session.get_session')
+    @patch('acky.iam.UserCollection.get_current')
+    def test_userinfo_is_fetched_once(self, _get_current_user, _get_session):
+        def get_current():
+            time.sleep(0.05)
+            return {'UserName': 'user'}
+
+        _get_current_user.side_effect = get_current
+        aws = AWS('region')
+        threads = [threading.Thread(target=lambda: aws.userinfo)
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(_get_current_user.call_count, 1)
+
+    @patch('botocore.session.get_session')
+    def test_for_region(self, _get_session):
+        aws = AWS('region', profile='profile')
+        other = aws.for_region('other')
+        self.assertEqual(other.region, 'other')
+        self.assertEqual(other.profile, 'profile')
+        self.assertIs(other.retry_policy, aws.retry_policy)
+
+    @patch('botocore.session.get_session')
+    def test_for_region_rate_limiter(self, _get_session):
+        aws = AWS('region', rate_limiter=RateLimiter(default=10))
+        other = aws.for_region('other')
+        self.assertIsNot(other.rate_limiter, aws.rate_limiter)
+        self.assertIs(aws.for_region('other').rate_limiter,
+                      other.rate_limiter)
+        self.assertIs(other.for_region('region').rate_limiter,
+                      aws.rate_limiter)
+
+    @patch('botocore.session.get_session')
+    def test_for_region_shares_session(self, _get_session):
+        aws = AWS('region', profile='profile')
+        other = aws.for_region('other')
+        self.assertIs(other.session, aws.session)
+        self.assertIs(other.services, aws.services)
+        self.assertEqual(_get_session.call_count, 1)
+
+    @patch('botocore.session.get_session')
+    def test_session_pool(self, _get_session):
+        pool = SessionPool()
+        first = AWS('region', profile='profile', session_pool=pool)
+        second = AWS('other', profile='profile', session_pool=pool)
+        third = AWS('region', profile='other', session_pool=pool)
+        self.assertIs(first.session, second.session)
+        self.assertIs(third.session_pool, pool)
+        self.assertEqual(_get_session.call_count, 2)
+        self.assertEqual(len(pool), 2)
+
+    @patch('botocore.session.get_session')
+    def test_across_regions(self, _get_session):
+        def region_name(aws):
+            if aws.region == 'bad':
+                raise ValueError(aws.region)
+            time.sleep(0.2)
+            return aws.region
+
+        start = time.time()
+        results = AWS('region').across_regions(['a', 'b', 'c', 'bad'],
+                                               region_name)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(results, {'a': 'a', 'b': 'b', 'c': 'c'})
+        self.assertEqual(list(results.errors), ['bad'])
+        self.assertIsInstance(results.errors['bad'], ValueError)
+
 
 class TestAwsApiClient(unittest.TestCase):
     class _HelpApiClient(AwsApiClient):
@@ -32,6 +106,23 @@ class TestAwsApiClient(unittest.TestCase):
         self._HelpApiClient(AWS('region'))
         _get_service.assert_called()
 
+    @patch('botocore.service.get_service')
+    def test_shares_service_and_endpoint(self, _get_service):
+        aws = AWS('region')
+        first = self._HelpApiClient(aws)
+        second = self._HelpApiClient(aws)
+        self.assertEqual(_get_service.call_count, 1)
+        self.assertIs(first._service, second._service)
+        self.assertIs(first._endpoint, second._endpoint)
+
+    @patch('botocore.service.get_service')
+    def test_invalidate(self, _get_service):
+        aws = AWS('region')
+        self._HelpApiClient(aws)
+        aws.invalidate('support')
+        self._HelpApiClient(aws)
+        self.assertEqual(_get_service.call_count, 2)
+
     @patch('botocore.operation.Operation.call')
     @patch('botocore.service.Service.get_operation')
     def test_call(self, get_operation, call):
@@ -40,6 +131,19 @@ class TestAwsApiClient(unittest.TestCase):
         call.assert_called()
 
 
+class _AWS(object):
+    """AWS object for mock testing with only basic features. Keyword
+    arguments are set as attributes, e.g. retry_policy or response_cache."""
+    def __init__(self, **attributes):
+        self.session = botocore.session.get_session()
+        self.region = 'us-east-1'
+        self.__dict__.update(attributes)
+
+    @property
+    def ec2(self):
+        return acky.ec2.EC2(self)
+
+
 class TestS3(unittest.TestCase):
     """Mock tests for S3. Ensure botocore calls are correct and happening."""
 
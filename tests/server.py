@@ -0,0 +1,340 @@
+"""A local HTTP server that speaks just enough of the EC2, SQS and S3 wire
+protocols for acky's tests and benchmarks. State is kept in memory and
+requests are not authenticated.
+
+EC2 and SQS share the Query protocol, so both are served from the same
+address and told apart by their Action names. S3 requests must use
+path-style addressing (see benchmarks.harness.make_aws()).
+"""
+from contextlib import contextmanager
+from hashlib import md5
+from xml.sax.saxutils import escape
+import os
+import threading
+import time
+import uuid
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlsplit, unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlsplit
+    from urllib import unquote
+
+from botocore.service import Service
+
+# botocore will not send unsigned requests; the server ignores signatures.
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+
+EC2_NS = "http://ec2.amazonaws.com/doc/2014-02-01/"
+SQS_NS = "http://queue.amazonaws.com/doc/2012-11-05/"
+S3_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+ACCOUNT = "123456789012"
+
+
+@contextmanager
+def stubbed(url):
+    """Send every request botocore makes inside the block to url. Patching
+    botocore rather than acky keeps the benchmarks runnable against older
+    acky commits."""
+    original = Service.get_endpoint
+
+    def get_endpoint(self, region_name=None, is_secure=True,
+                     endpoint_url=None, verify=None):
+        return original(self, region_name, is_secure, endpoint_url or url,
+                        verify)
+
+    Service.get_endpoint = get_endpoint
+    try:
+        yield
+    finally:
+        Service.get_endpoint = original
+
+
+def _tag(name, value):
+    return "<{0}>{1}</{0}>".format(name, escape(str(value)))
+
+
+class StubState(object):
+    """In-memory EC2 instances, SQS queues and S3 objects."""
+    def __init__(self, instances=1000):
+        self.instances = ["i-{0:08x}".format(n) for n in range(instances)]
+        # Seconds each DescribeInstances page takes to produce.
+        self.page_latency = 0
+        # (status, code) errors to answer the next EC2 and SQS requests with,
+        # in order, and the number of those requests received.
+        self.errors = []
+        self.requests = 0
+        self.queues = {}
+        self.objects = {}
+        self.lock = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in one segment, so Nagle's algorithm and
+    # delayed ACKs do not add 40ms to every keep-alive request.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, body=b'', headers=None):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, code, message):
+        self._send(status, "<Response><Errors><Error>{0}{1}</Error></Errors>"
+                   "<RequestID>stub</RequestID></Response>".format(
+                       _tag('Code', code), _tag('Message', message)))
+
+    def do_POST(self):
+        params = dict((k, v[0]) for k, v in
+                      parse_qs(self._body().decode('utf-8')).items())
+        action = params.get('Action')
+        with self.state.lock:
+            self.state.requests += 1
+            error = self.state.errors.pop(0) if self.state.errors else None
+        if error is not None:
+            status, code = error
+            return self._error(status, code, 'Stub error.')
+        handler = getattr(self, '_ec2_' + str(action), None) or \
+            getattr(self, '_sqs_' + str(action), None)
+        if handler is None:
+            return self._error(400, 'InvalidAction',
+                               'Unknown action {0}'.format(action))
+        handler(params)
+
+    do_GET = do_PUT = do_DELETE = do_HEAD = lambda self: self._s3()
+
+    # EC2
+
+    def _ec2(self, action, body):
+        self._send(200, '<{0}Response xmlns="{1}"><requestId>stub'
+                   '</requestId>{2}</{0}Response>'.format(
+                       action, EC2_NS, body))
+
+    def _ec2_DescribeVpcs(self, params):
+        self._ec2('DescribeVpcs', '<vpcSet><item><vpcId>vpc-00000001</vpcId>'
+                  '<state>available</state><cidrBlock>10.0.0.0/16</cidrBlock>'
+                  '<isDefault>true</isDefault></item></vpcSet>')
+
+    def _ec2_DescribeAvailabilityZones(self, params):
+        self._ec2('DescribeAvailabilityZones', '<availabilityZoneInfo>{0}'
+                  '</availabilityZoneInfo>'.format(''.join(
+                      '<item><zoneName>us-east-1{0}</zoneName>'
+                      '<zoneState>available</zoneState>'
+                      '<regionName>us-east-1</regionName></item>'.format(zone)
+                      for zone in 'abcd')))
+
+    def _ec2_DescribeInstances(self, params):
+        instances = self.state.instances
+        if self.state.page_latency:
+            time.sleep(self.state.page_latency)
+        numbers = range(len(instances))
+        # Only the availability-zone filter is supported.
+        n = 1
+        while 'Filter.{0}.Name'.format(n) in params:
+            if params['Filter.{0}.Name'.format(n)] == 'availability-zone':
+                zone = params['Filter.{0}.Value.1'.format(n)][-1]
+                numbers = [i for i in numbers if 'abcd'[i % 4] == zone]
+            n += 1
+        start = int(params.get('NextToken') or 0)
+        end = min(start + int(params.get('MaxResults') or 1000),
+                  len(numbers))
+        items = []
+        for n in numbers[start:end]:
+            items.append(
+                '<item><reservationId>r-{0:08x}</reservationId>'
+                '<ownerId>{1}</ownerId><instancesSet><item>'
+                '<instanceId>{2}</instanceId><imageId>ami-00000001</imageId>'
+                '<instanceState><code>16</code><name>running</name>'
+                '</instanceState><instanceType>m3.medium</instanceType>'
+                '<placement><availabilityZone>us-east-1{3}</availabilityZone>'
+                '</placement><privateIpAddress>10.0.{4}.{5}</privateIpAddress>'
+                '<tagSet><item><key>Name</key><value>bench-{0}</value></item>'
+                '</tagSet></item></instancesSet></item>'.format(
+                    n, ACCOUNT, instances[n], 'abcd'[n % 4],
+                    n // 250, n % 250 + 1))
+        token = _tag('nextToken', end) if end < len(numbers) else ''
+        self._ec2('DescribeInstances', '<reservationSet>{0}</reservationSet>'
+                  '{1}'.format(''.join(items), token))
+
+    # SQS
+
+    def _sqs(self, action, body=''):
+        self._send(200, '<{0}Response xmlns="{1}"><{0}Result>{2}</{0}Result>'
+                   '<ResponseMetadata><RequestId>stub</RequestId>'
+                   '</ResponseMetadata></{0}Response>'.format(action, SQS_NS,
+                                                              body))
+
+    def _queue_url(self, name):
+        return "http://{0}:{1}/{2}/{3}".format(self.server.server_address[0],
+                                               self.server.server_address[1],
+                                               ACCOUNT, name)
+
+    def _queue(self, params):
+        return self.state.queues.setdefault(
+            params['QueueUrl'].rsplit('/', 1)[-1], [])
+
+    def _sqs_CreateQueue(self, params):
+        with self.state.lock:
+            self.state.queues.setdefault(params['QueueName'], [])
+        self._sqs('CreateQueue', _tag('QueueUrl',
+                                      self._queue_url(params['QueueName'])))
+
+    def _sqs_GetQueueUrl(self, params):
+        if params['QueueName'] not in self.state.queues:
+            return self._error(400, 'AWS.SimpleQueueService.NonExistentQueue',
+                               'The specified queue does not exist.')
+        self._sqs('GetQueueUrl', _tag('QueueUrl',
+                                      self._queue_url(params['QueueName'])))
+
+    def _sqs_ListQueues(self, params):
+        prefix = params.get('QueueNamePrefix', '')
+        self._sqs('ListQueues', ''.join(
+            _tag('QueueUrl', self._queue_url(name))
+            for name in sorted(self.state.queues) if name.startswith(prefix)))
+
+    def _sqs_SendMessage(self, params):
+        body = params['MessageBody']
+        message_id = str(uuid.uuid4())
+        with self.state.lock:
+            self._queue(params).append((message_id, body))
+        digest = md5(body.encode('utf-8')).hexdigest()
+        self._sqs('SendMessage', ''.join([_tag('MD5OfMessageBody', digest),
+                                          _tag('MessageId', message_id)]))
+
+    def _sqs_ReceiveMessage(self, params):
+        count = int(params.get('MaxNumberOfMessages') or 1)
+        with self.state.lock:
+            queue = self._queue(params)
+            messages, queue[:count] = queue[:count], []
+        self._sqs('ReceiveMessage', ''.join(
+            '<Message>{0}{1}{2}{3}</Message>'.format(
+                _tag('MessageId', message_id),
+                _tag('ReceiptHandle', message_id),
+                _tag('MD5OfBody', md5(body.encode('utf-8')).hexdigest()),
+                _tag('Body', body))
+            for message_id, body in messages))
+
+    def _sqs_DeleteMessage(self, params):
+        self._sqs('DeleteMessage')
+
+    # S3
+
+    def _s3(self):
+        parts = urlsplit(self.path)
+        path = unquote(parts.path).lstrip('/')
+        bucket, _, key = path.partition('/')
+        query = dict((k, v[0]) for k, v in
+                     parse_qs(parts.query, keep_blank_values=True).items())
+        objects = self.state.objects
+        if self.command == 'PUT':
+            data = self._body()
+            if key:
+                with self.state.lock:
+                    objects[(bucket, key)] = data
+            return self._send(200, headers={
+                'ETag': '"{0}"'.format(md5(data).hexdigest())})
+        if self.command == 'DELETE':
+            with self.state.lock:
+                objects.pop((bucket, key), None)
+            return self._send(204)
+        if not bucket:
+            names = sorted(set(b for b, _ in objects))
+            return self._send(200, '<ListAllMyBucketsResult xmlns="{0}">'
+                              '<Buckets>{1}</Buckets>'
+                              '</ListAllMyBucketsResult>'.format(
+                                  S3_NS, ''.join(
+                                      '<Bucket>{0}</Bucket>'.format(
+                                          _tag('Name', name))
+                                      for name in names)))
+        if not key:
+            return self._list_objects(bucket, query)
+        data = objects.get((bucket, key))
+        if data is None:
+            return self._send(404, '<Error><Code>NoSuchKey</Code><Message>'
+                              'The specified key does not exist.</Message>'
+                              '</Error>')
+        self._send(200, data, {'Content-Type': 'application/octet-stream',
+                               'ETag': '"{0}"'.format(md5(data).hexdigest())})
+
+    def _list_objects(self, bucket, query):
+        prefix = query.get('prefix', '')
+        marker = query.get('marker', '')
+        max_keys = int(query.get('max-keys') or 1000)
+        keys = sorted(key for b, key in self.state.objects
+                      if b == bucket and key.startswith(prefix)
+                      if key > marker)
+        page = keys[:max_keys]
+        contents = ''.join(
+            '<Contents>{0}{1}{2}</Contents>'.format(
+                _tag('Key', key),
+                _tag('Size', len(self.state.objects[(bucket, key)])),
+                _tag('StorageClass', 'STANDARD'))
+            for key in page)
+        self._send(200, '<ListBucketResult xmlns="{0}">{1}{2}{3}'
+                   '</ListBucketResult>'.format(
+                       S3_NS, _tag('Name', bucket),
+                       _tag('IsTruncated',
+                            'true' if len(keys) > max_keys else 'false'),
+                       contents))
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubAWSServer(object):
+    """Serves a StubState on a free local port until stopped::
+
+        with StubAWSServer(instances=5000) as server:
+            ... server.url ...
+    """
+    def __init__(self, instances=1000, host='127.0.0.1', port=0):
+        self.state = StubState(instances)
+        self._server = _Server((host, port), _Handler)
+        self._server.state = self.state
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
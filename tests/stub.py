@@ -0,0 +1,53 @@
+"""Stand-ins for botocore endpoints so acky can be measured without network
+access."""
+
+
+class StubRequest(object):
+    def __init__(self, body=''):
+        self.body = body
+        self.headers = {}
+
+
+class StubResponse(object):
+    """An HTTP response, with the request it answered if request_body is
+    given."""
+    def __init__(self, status_code=200, text='', headers=None,
+                 request_body=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+        if request_body is not None:
+            self.request = StubRequest(request_body)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class StubEndpoint(object):
+    """Endpoint whose make_request() returns canned data instead of sending
+    an HTTP request. Pass a callable to compute the data per request."""
+    def __init__(self, data=None, response=None):
+        self.data = data if data is not None else {}
+        self.response = response or StubResponse()
+        self.requests = 0
+
+    def make_request(self, operation, params):
+        self.requests += 1
+        data = self.data
+        if callable(data):
+            data = data(operation, params)
+        return self.response, data
+
+
+class ReplayEndpoint(object):
+    """Endpoint that returns a list of (response, data) pairs in order,
+    one per request."""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = 0
+
+    def make_request(self, operation, params):
+        self.requests += 1
+        return self.responses.pop(0)
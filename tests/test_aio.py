@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+from tests import _AWS
+try:
+    import asyncio
+    from acky.aio import AsyncAWS
+except (ImportError, SyntaxError):
+    AsyncAWS = None
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+@unittest.skipIf(AsyncAWS is None, "asyncio front-end needs Python 3.5+")
+class TestAsyncAWS(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.aws = AsyncAWS(aws=_AWS(), concurrency={'ec2': 2})
+
+    def tearDown(self):
+        self.aws.close()
+        self.loop.close()
+
+    def wait(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_pool_fits_every_limit(self):
+        self.assertEqual(self.aws.max_workers, 2 + 5 * 10)
+        aws = AsyncAWS(aws=_AWS(), concurrency={'sdb': 20, 's3': 50})
+        self.assertEqual(aws.max_workers, 20 + 50 + 5 * 10)
+        aws.close()
+        self.assertRaises(ValueError, AsyncAWS, aws=_AWS(), max_workers=0)
+
+    @patch('acky.api.AwsApiClient.call')
+    def test_awaitable_methods(self, _call):
+        _call.return_value = [{'VpcId': 'vpc-1'}]
+        self.assertEqual(self.wait(self.aws.ec2.VPCs.get()),
+                         [{'VpcId': 'vpc-1'}])
+        _call.assert_called_once_with("DescribeVpcs",
+                                      response_data_key="Vpcs")
+
+    @patch('acky.api.AwsApiClient.call')
+    def test_bounded_concurrency(self, _call):
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+
+        def slow_call(*args, **kwargs):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.05)
+            with lock:
+                state['running'] -= 1
+            return []
+
+        _call.side_effect = slow_call
+        calls = [self.aws.ec2.VPCs.get() for _ in range(6)]
+        self.wait(asyncio.gather(*calls))
+        self.assertEqual(state['peak'], 2)
+
+    @patch('acky.api.AwsApiClient.call')
+    def test_cancellation_releases_slot(self, _call):
+        release = threading.Event()
+        _call.side_effect = lambda *args, **kwargs: release.wait(1) and []
+        tasks = [self.loop.create_task(self.aws.ec2.VPCs.get())
+                 for _ in range(3)]
+        self.wait(asyncio.sleep(0.05))
+        for task in tasks:
+            task.cancel()
+        release.set()
+        self.wait(asyncio.gather(*tasks, return_exceptions=True))
+        self.assertTrue(all(task.cancelled() for task in tasks))
+        _call.side_effect = None
+        _call.return_value = ['vpc-1']
+        self.assertEqual(self.wait(self.aws.ec2.VPCs.get()), ['vpc-1'])
+
+    @patch('acky.api.AwsApiClient.iter_call')
+    def test_async_iteration(self, _iter_call):
+        _iter_call.return_value = iter([{'SnapshotId': 'snap-%d' % n}
+                                        for n in range(250)])
+        snapshots = self.wait(self.aws.ec2.Snapshots.get(stream=True))
+        collected = []
+        while True:
+            try:
+                collected.append(self.wait(snapshots.__anext__()))
+            except StopAsyncIteration:
+                break
+        self.assertEqual(len(collected), 250)
+        self.assertEqual(collected[-1], {'SnapshotId': 'snap-249'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import unittest
+from acky.api import (AWSCallError, AWSErrorNotFound, extract_aws_error,
+                      make_projection)
+from tests import _AWS
+try:
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    from mock import patch, MagicMock
+
+
+def _response(status_code=200, text=''):
+    resp = MagicMock()
+    resp.ok = status_code < 400
+    resp.status_code = status_code
+    resp.text = text
+    return resp
+
+
+class TestCall(unittest.TestCase):
+    @patch('botocore.service.Service.get_operation')
+    def test_caches_operations(self, _get_operation):
+        _get_operation.return_value.call.return_value = (
+            _response(), {'Vpcs': []})
+        client = _AWS().ec2.VPCs
+        client.call("DescribeVpcs", response_data_key="Vpcs")
+        client.call("DescribeVpcs", response_data_key="Vpcs")
+        _get_operation.assert_called_once_with("DescribeVpcs")
+
+    def test_returns_data_key(self):
+        client = _AWS().ec2.VPCs
+        op = MagicMock()
+        op.call.return_value = (_response(), {'Vpcs': ['vpc-1']})
+        client._operations["DescribeVpcs"] = op
+        self.assertEqual(client.call("DescribeVpcs",
+                                     response_data_key="Vpcs"), ['vpc-1'])
+        self.assertIsNone(client.call("DescribeVpcs",
+                                      response_data_key="Missing"))
+
+
+class TestIterCall(unittest.TestCase):
+    def _client(self, pages, pagination):
+        client = _AWS().ec2.Instances
+        op = MagicMock()
+        op.pagination = pagination
+        op.call.side_effect = [(_response(), page) for page in pages]
+        client._operations["DescribeInstances"] = op
+        return client, op
+
+    def test_follows_next_token(self):
+        pages = [{'Reservations': [{'Instances': [{'InstanceId': 'i-1'}]}],
+                  'NextToken': 'abc'},
+                 {'Reservations': [{'Instances': [{'InstanceId': 'i-2'},
+                                                  {'InstanceId': 'i-3'}]}]}]
+        client, op = self._client(pages, {
+            'input_token': 'NextToken', 'output_token': 'NextToken',
+            'result_key': 'Reservations', 'py_input_token': 'next_token'})
+        instances = client.get(stream=True)
+        self.assertFalse(op.call.called)
+        self.assertEqual([i['InstanceId'] for i in instances],
+                         ['i-1', 'i-2', 'i-3'])
+        self.assertEqual(op.call.call_count, 2)
+        self.assertEqual(op.call.call_args[1], {'next_token': 'abc'})
+
+    def test_stops_when_not_truncated(self):
+        pages = [{'Contents': [{'Key': 'a'}], 'IsTruncated': True},
+                 {'Contents': [{'Key': 'b'}], 'IsTruncated': False}]
+        client, op = self._client(pages, {
+            'more_results': 'IsTruncated',
+            'output_token': 'NextMarker || Contents[-1].Key',
+            'input_token': 'Marker', 'result_key': ['Contents'],
+            'py_input_token': 'marker'})
+        items = list(client.iter_call("DescribeInstances"))
+        self.assertEqual(items, [{'Key': 'a'}, {'Key': 'b'}])
+        self.assertEqual(op.call.call_args[1], {'marker': 'a'})
+
+    def test_projected_fields(self):
+        first = {'InstanceId': 'i-1', 'KeyName': 'k',
+                 'State': {'Code': 16, 'Name': 'running'},
+                 'Tags': [{'Key': 'Name', 'Value': 'web'}]}
+        pages = [{'Reservations': [{'Instances': [first],
+                                    'ReservationId': 'r-1'}],
+                  'NextToken': 'abc'},
+                 {'Reservations': [{'Instances': [{'InstanceId': 'i-2'}]}]}]
+        client, op = self._client(pages, {
+            'input_token': 'NextToken', 'output_token': 'NextToken',
+            'result_key': 'Reservations', 'py_input_token': 'next_token'})
+        instances = client.get(stream=True, fields=['InstanceId', 'Tags',
+                                                    'State.Name'])
+        self.assertEqual(list(instances), [
+            {'InstanceId': 'i-1', 'State': {'Name': 'running'},
+             'Tags': [{'Key': 'Name', 'Value': 'web'}]},
+            {'InstanceId': 'i-2'}])
+
+    def test_page_size_and_early_stop(self):
+        pages = [{'Reservations': [{'Instances': [{'InstanceId': 'i-1'},
+                                                  {'InstanceId': 'i-2'}]}],
+                  'NextToken': 'abc'},
+                 {'Reservations': [{'Instances': [{'InstanceId': 'i-3'}]}]}]
+        client, op = self._client(pages, {
+            'input_token': 'NextToken', 'output_token': 'NextToken',
+            'limit_key': 'MaxResults', 'result_key': 'Reservations',
+            'py_input_token': 'next_token'})
+        found = client.find(lambda i: i['InstanceId'] == 'i-2', page_size=5)
+        self.assertEqual(found, {'InstanceId': 'i-2'})
+        op.call.assert_called_once_with(client._endpoint, MaxResults=5)
+        self.assertEqual(client.find(lambda i: False), None)
+        self.assertEqual(op.call.call_count, 2)
+        op.call.assert_called_with(client._endpoint, MaxResults=1000)
+
+    def test_unpaginated_operation(self):
+        client, op = self._client([{'Reservations': [1, 2]}], None)
+        del op.pagination
+        self.assertEqual(list(client.iter_call(
+            "DescribeInstances", response_data_key="Reservations")), [1, 2])
+
+
+class TestMakeProjection(unittest.TestCase):
+    def test_paths(self):
+        item = {'ImageId': 'ami-1', 'Name': 'base',
+                'BlockDeviceMappings': [
+                    {'DeviceName': '/dev/sda1',
+                     'Ebs': {'SnapshotId': 'snap-1', 'VolumeSize': 8}},
+                    {'DeviceName': '/dev/sdb', 'VirtualName': 'ephemeral0'}]}
+        project = make_projection(['ImageId', 'Missing.Path',
+                                   'BlockDeviceMappings.Ebs.SnapshotId'])
+        self.assertEqual(project(item), {
+            'ImageId': 'ami-1',
+            'BlockDeviceMappings': [{'Ebs': {'SnapshotId': 'snap-1'}}, {}]})
+        self.assertEqual(make_projection('Name')(item), {'Name': 'base'})
+
+    def test_whole_field_wins(self):
+        item = {'State': {'Code': 16, 'Name': 'running'}}
+        for fields in (['State', 'State.Name'], ['State.Name', 'State']):
+            self.assertEqual(make_projection(fields)(item), item)
+
+
+class TestExtractAwsError(unittest.TestCase):
+    def test_query_error(self):
+        xml = ("<Response><Errors><Error><Code>InvalidInstanceID.NotFound"
+               "</Code><Message>The instance ID 'i-1' does not exist"
+               "</Message></Error></Errors><RequestID>x</RequestID>"
+               "</Response>")
+        self.assertEqual(extract_aws_error(xml),
+                         ("InvalidInstanceID.NotFound",
+                          "The instance ID 'i-1' does not exist"))
+
+    def test_skips_incomplete_errors(self):
+        xml = ("<Errors><Error><Code>A</Code></Error>"
+               "<Error><Code>B</Code><Message>b &amp; c</Message></Error>"
+               "<Error><Code>C</Code><Message>c</Message></Error></Errors>")
+        self.assertEqual(extract_aws_error(xml), ("B", "b & c"))
+
+    def test_not_an_error(self):
+        for body in (None, "", "<html>Service Unavailable",
+                     "<Response><Code>A</Code><Message>a</Message>"
+                     "</Response>"):
+            self.assertRaises(AWSErrorNotFound, extract_aws_error, body)
+
+    def test_call_error_is_lazy(self):
+        response = _response(503, "<Error><Code>SlowDown</Code>"
+                                  "<Message>Slow down</Message></Error>")
+        error = AWSCallError(response, "PutObject")
+        self.assertIsNone(error._error)
+        self.assertEqual(str(error), "PutObject: SlowDown: Slow down")
+
+    def test_call_error_without_body(self):
+        error = AWSCallError(_response(503, ""), "PutObject")
+        self.assertIsNone(error.code)
+        self.assertIsNone(error.message)
+
+
+if __name__ == '__main__':
+    unittest.main()
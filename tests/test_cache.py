@@ -0,0 +1,181 @@
+import threading
+import time
+import unittest
+from acky.cache import ResponseCache, SingleFlight, request_key
+from tests import _AWS
+try:
+    from unittest.mock import MagicMock
+except ImportError:
+    from mock import MagicMock
+
+
+class _Clock(object):
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.cache = ResponseCache(max_size=2, ttl=10,
+                                   ttls={'DescribeImages': 100},
+                                   clock=self.clock)
+
+    def test_params_are_normalized(self):
+        self.assertEqual(
+            request_key('ec2', 'r', 'DescribeVpcs', {'a': 1, 'b': [2]}),
+            request_key('ec2', 'r', 'DescribeVpcs', {'b': [2], 'a': 1}))
+        self.assertEqual(
+            hash(request_key('ec2', 'r', 'DescribeVpcs', {'a': {1, 2}})),
+            hash(request_key('ec2', 'r', 'DescribeVpcs', {'a': {2, 1}})))
+
+    def test_expires(self):
+        key = request_key('ec2', 'r', 'DescribeVpcs', {})
+        self.cache.put(key, {'Vpcs': []})
+        self.assertEqual(self.cache.get(key), {'Vpcs': []})
+        self.clock.now = 11
+        self.assertIsNone(self.cache.get(key))
+
+    def test_per_operation_ttl(self):
+        self.assertEqual(self.cache.ttl_for('ec2', 'DescribeImages'), 100)
+        self.assertEqual(self.cache.ttl_for('ec2', 'DescribeVpcs'), 10)
+
+    def test_lru_eviction(self):
+        keys = [request_key('ec2', 'r', 'DescribeVpcs', {'n': n})
+                for n in range(3)]
+        self.cache.put(keys[0], {})
+        self.cache.put(keys[1], {})
+        self.cache.get(keys[0])
+        self.cache.put(keys[2], {})
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+
+    def test_returns_copies(self):
+        key = request_key('ec2', 'r', 'DescribeVpcs', {})
+        data = {'Vpcs': [{'VpcId': 'vpc-1'}]}
+        self.cache.put(key, data)
+        data['Vpcs'].append({})
+        self.cache.get(key)['Vpcs'].append({})
+        self.assertEqual(len(self.cache.get(key)['Vpcs']), 1)
+
+    def test_put_after_invalidate_is_dropped(self):
+        key = request_key('ec2', 'r', 'DescribeVpcs', {})
+        generation = self.cache.generation('ec2', 'r')
+        self.cache.invalidate('ec2', 'r')
+        self.cache.put(key, {'Vpcs': []}, generation)
+        self.assertIsNone(self.cache.get(key))
+        generation = self.cache.generation('ec2', 'r')
+        self.cache.invalidate('sqs', 'r')
+        self.cache.put(key, {'Vpcs': []}, generation)
+        self.assertEqual(self.cache.get(key), {'Vpcs': []})
+        self.cache.invalidate()
+        self.assertNotEqual(self.cache.generation('ec2', 'r'), generation)
+
+    def test_cacheable(self):
+        self.assertTrue(self.cache.cacheable('ec2', 'DescribeVpcs'))
+        self.assertFalse(self.cache.cacheable('ec2', 'CreateVpc'))
+        self.assertFalse(self.cache.cacheable('sts', 'GetSessionToken'))
+
+
+class TestCachedCall(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache()
+        self.client = _AWS(response_cache=self.cache).ec2.SecurityGroups
+        self.describe = MagicMock()
+        self.describe.is_streaming.return_value = False
+        self.describe.call.return_value = (MagicMock(ok=True),
+                                           {'SecurityGroups': []})
+        self.create = MagicMock()
+        self.create.call.return_value = (MagicMock(ok=True), {})
+        self.client._operations["DescribeSecurityGroups"] = self.describe
+        self.client._operations["CreateSecurityGroup"] = self.create
+
+    def test_reads_through(self):
+        self.client.get(filters={'group-name': 'web'})
+        self.client.get(filters={'group-name': 'web'})
+        self.assertEqual(self.describe.call.call_count, 1)
+        self.client.get(filters={'group-name': 'db'})
+        self.assertEqual(self.describe.call.call_count, 2)
+
+    def test_set_params(self):
+        for group_ids in ({'sg-1', 'sg-2'}, frozenset(['sg-2', 'sg-1'])):
+            self.client.call("DescribeSecurityGroups", GroupIds=group_ids)
+        self.assertEqual(self.describe.call.call_count, 1)
+
+    def test_cache_bypass(self):
+        self.client.get()
+        for _ in range(2):
+            self.client.call("DescribeSecurityGroups", cache=False)
+        self.assertEqual(self.describe.call.call_count, 3)
+        self.assertEqual(self.describe.call.call_args[1], {})
+
+    def test_mutation_invalidates(self):
+        self.client.get()
+        self.client.create("web", "web servers")
+        self.client.get()
+        self.assertEqual(self.describe.call.call_count, 2)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_coalesces_concurrent_calls(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return {'QueueUrl': 'https://queue'}
+
+        def worker():
+            results.append(flights.do('key', fetch))
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        while flights.coalesced < 9:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'QueueUrl': 'https://queue'}] * 10)
+        self.assertEqual(len(set(id(r) for r in results)), 10)
+
+    def test_invalidate_starts_new_flight(self):
+        flights = SingleFlight()
+        key = request_key('ec2', 'r', 'DescribeVpcs', {})
+        release = threading.Event()
+        results = []
+
+        def before():
+            release.wait()
+            return 'before'
+
+        thread = threading.Thread(
+            target=lambda: results.append(flights.do(key, before)))
+        thread.start()
+        while not flights._flights:
+            time.sleep(0.01)
+        flights.invalidate('ec2', 'r')
+        self.assertEqual(flights.do(key, lambda: 'after'), 'after')
+        release.set()
+        thread.join()
+        self.assertEqual(results, ['before'])
+        self.assertEqual(flights.coalesced, 0)
+
+    def test_shares_errors(self):
+        flights = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        self.assertRaises(ValueError, flights.do, 'key', fail)
+        self.assertEqual(flights.do('key', lambda: 1), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import botocore.session
+import socket
+import unittest
+from acky.aws import SessionPool
+from acky.connections import HttpConfig
+
+
+class TestHttpConfig(unittest.TestCase):
+    def setUp(self):
+        self.config = HttpConfig(max_pool_connections=32, pool_block=True,
+                                 connect_timeout=2, read_timeout=7,
+                                 tcp_keepalive=True)
+        session = botocore.session.get_session()
+        endpoint = session.get_service('ec2').get_endpoint('us-east-1')
+        self.adapter = self.config.apply(endpoint).http_session.get_adapter(
+            'https://ec2.us-east-1.amazonaws.com/')
+
+    def test_hashable(self):
+        self.assertEqual(self.config, HttpConfig(32, True, connect_timeout=2,
+                                                 read_timeout=7,
+                                                 tcp_keepalive=True))
+        self.assertNotEqual(self.config, HttpConfig())
+        self.assertEqual(len(set([HttpConfig(), HttpConfig()])), 1)
+
+    def test_pool_settings(self):
+        pool = self.adapter.poolmanager.connection_from_url(
+            'https://ec2.us-east-1.amazonaws.com/')
+        self.assertEqual(pool.pool.maxsize, 32)
+        self.assertTrue(pool.block)
+        self.assertIs(pool.ConnectionCls.http_config, self.config)
+
+    def test_socket_options(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        try:
+            url = 'http://127.0.0.1:{0}/'.format(listener.getsockname()[1])
+            pool = self.adapter.poolmanager.connection_from_url(url)
+            connection = pool._new_conn()
+            connection.connect()
+            sock = connection.sock
+            self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP,
+                                            socket.TCP_NODELAY))
+            self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+                                            socket.SO_KEEPALIVE))
+            self.assertEqual(sock.gettimeout(), 7)
+            connection.close()
+        finally:
+            listener.close()
+
+    def test_session_pool_key(self):
+        pool = SessionPool()
+        first = pool.get('profile', 'us-east-1', self.config)
+        self.assertIs(pool.get('profile', 'us-west-2', self.config), first)
+        self.assertIsNot(pool.get('profile', 'us-east-1'), first)
+        self.assertIs(first[1].http_config, self.config)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import botocore
 import unittest
-import acky
+import acky.ec2
+from acky.api import AWSCallError
+from tests.stub import StubResponse
 try:
     from unittest.mock import patch, call, ANY
 except ImportError:
@@ -25,6 +27,12 @@ class _AWS(object):
         return acky.ec2.EC2(self)
 
 
+def _error_response(code, message):
+    return StubResponse(400, "<Response><Errors><Error><Code>{0}</Code>"
+                        "<Message>{1}</Message></Error></Errors>"
+                        "</Response>".format(code, message))
+
+
 class TestRegions(unittest.TestCase):
     @patch('acky.api.AwsApiClient.call')
     def test_regions(self, _call):
@@ -268,6 +276,113 @@ class TestInstanceCollection(_TestEC2Collection, unittest.TestCase):
                 format(self.class_name, expectation,
                        _call.mock_calls)
 
+    @patch('acky.ec2.CONTROL_CHUNK', 4)
+    @patch('acky.api.AwsApiClient.call')
+    def test_control_results(self, _call):
+        def call(operation, response_data_key, InstanceIds=None, **kwargs):
+            if 'i-bad' in (InstanceIds or [kwargs.get('InstanceId')]):
+                raise AWSCallError(_error_response(
+                    'InvalidInstanceID.NotFound',
+                    "The instance ID 'i-bad' does not exist"), operation)
+            if InstanceIds is None:
+                return True
+            return [{'InstanceId': i, 'CurrentState': {'Name': 'stopping'}}
+                    for i in InstanceIds]
+        _call.side_effect = call
+        instances = ['i-{0}'.format(n) for n in range(9)] + ['i-bad']
+
+        results = self.instance.control(instances, 'stop')
+        self.assertEqual(sorted(results), sorted(instances[:-1]))
+        self.assertEqual(results['i-3']['CurrentState']['Name'], 'stopping')
+        self.assertEqual(list(results.errors), ['i-bad'])
+        chunks = [c[1]['InstanceIds'] for c in _call.call_args_list]
+        self.assertTrue(all(len(chunk) <= 4 for chunk in chunks))
+        self.assertIn(['i-8'], chunks)
+        self.assertEqual(len(chunks), 4)
+
+        _call.reset_mock()
+        results = self.instance.control(instances, 'protect', max_workers=4)
+        self.assertEqual(results, dict((i, True) for i in instances[:-1]))
+        self.assertIsInstance(results.errors['i-bad'], AWSCallError)
+        self.assertEqual(_call.call_count, 10)
+
+        self.assertRaises(AWSCallError, self.instance.destroy, 'i-bad')
+        self.assertRaises(AWSCallError, self.instance.control, instances,
+                          'stop', raise_on_error=True)
+
+    @patch('acky.api.AwsApiClient.call')
+    def test_control_default_workers(self, _call):
+        _call.side_effect = lambda operation, response_data_key, \
+            InstanceIds: [{'InstanceId': i} for i in InstanceIds]
+        instances = ['i-{0}'.format(n) for n in range(2500)]
+        results = self.instance.control(instances, 'stop', max_workers=None)
+        self.assertEqual(sorted(results), sorted(instances))
+        self.assertEqual(_call.call_count, 3)
+
+    @patch('acky.api.AwsApiClient.call')
+    def test_control_splits_only_on_id_errors(self, _call):
+        _call.side_effect = AWSCallError(_error_response(
+            'IncorrectInstanceState', 'The instance is not in a state '
+            'from which it can be started.'), 'StartInstances')
+        results = self.instance.control(['i-1', 'i-2', 'i-3'], 'start')
+        self.assertEqual(sorted(results.errors), ['i-1', 'i-2', 'i-3'])
+        self.assertEqual(_call.call_count, 1)
+
+        _call.reset_mock()
+        _call.side_effect = AWSCallError(_error_response(
+            'InvalidInstanceID.Malformed', 'Invalid id: "x"'),
+            'StartInstances')
+        results = self.instance.control(['i-1', 'i-2', 'i-3'], 'start')
+        self.assertEqual(sorted(results.errors), ['i-1', 'i-2', 'i-3'])
+        self.assertEqual(_call.call_count, 5)
+
+    @patch('acky.api.AwsApiClient.call')
+    def test_load(self, _call):
+        _call.return_value = [{'Instances': [{'InstanceId': "i-1"},
+                                             {'InstanceId': "i-2"}]}]
+        futures = [self.instance.load("i-1"), self.instance.load("i-2"),
+                   self.instance.load("i-3")]
+        self.assertEqual([f.result(1)['InstanceId'] for f in futures[:2]],
+                         ["i-1", "i-2"])
+        self.assertIsNone(futures[2].result(1))
+        _call.assert_called_once_with(
+            "DescribeInstances", response_data_key="Reservations",
+            filters=[{'Name': 'instance-id',
+                      'Values': ["i-1", "i-2", "i-3"]}])
+
+    @patch('acky.api.AwsApiClient.iter_call')
+    @patch('acky.api.AwsApiClient.call')
+    def test_sharded_get(self, _call, _iter_call):
+        _call.return_value = [{'ZoneName': 'us-east-1a'},
+                              {'ZoneName': 'us-east-1b'}]
+        by_zone = {
+            'us-east-1a': [{'InstanceId': 'i-1'}, {'InstanceId': 'i-2'}],
+            'us-east-1b': [{'InstanceId': 'i-2'}, {'InstanceId': 'i-3'}]}
+
+        def iter_call(operation, **kwargs):
+            zone = [f['Values'] for f in kwargs['filters']
+                    if f['Name'] == 'availability-zone'][0][0]
+            return iter([{'Instances': by_zone[zone]}])
+        _iter_call.side_effect = iter_call
+
+        instances = self.instance.get(shard_by='az',
+                                      filters={'tag:role': 'web'})
+        self.assertEqual(sorted(i['InstanceId'] for i in instances),
+                         ['i-1', 'i-2', 'i-3'])
+        _call.assert_called_once_with("DescribeAvailabilityZones",
+                                      response_data_key="AvailabilityZones")
+        for args, kwargs in _iter_call.call_args_list:
+            self.assertIn({'Name': 'tag:role', 'Values': ['web']},
+                          kwargs['filters'])
+
+        instances = self.instance.get(
+            shard_by='az', filters={'availability-zone': 'us-east-1b'})
+        self.assertEqual([i['InstanceId'] for i in instances], ['i-2', 'i-3'])
+        self.assertEqual(_call.call_count, 1)
+        self.assertRaises(ValueError, self.instance.get, shard_by='region')
+        self.assertRaises(ValueError, self.instance.get, shard_by='az',
+                          instance_ids=['i-1'])
+
 
 class TestKeyCollection(_TestEC2Collection, unittest.TestCase):
     class_name = "KeyPairs"
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestImport(unittest.TestCase):
+    def test_import_is_lazy(self):
+        code = "import sys, acky.aws; print(' '.join(sys.modules))"
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=ROOT)
+        modules = output.decode('utf-8').split()
+        for name in ('botocore', 'botocore.session', 'jmespath',
+                     'concurrent.futures', 'acky.ec2', 'acky.iam', 'acky.rds',
+                     'acky.sqs', 'acky.sts', 'acky.s3'):
+            self.assertNotIn(name, modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
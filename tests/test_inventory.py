@@ -0,0 +1,157 @@
+import copy
+import unittest
+from acky.inventory import VOLUME_FULL_REFRESH, Ec2Inventory
+
+
+def _instance(instance_id, state='running', subnet='subnet-1', tags=None):
+    return {'InstanceId': instance_id, 'State': {'Name': state},
+            'SubnetId': subnet, 'VpcId': 'vpc-1',
+            'Placement': {'AvailabilityZone': 'us-east-1a'},
+            'Tags': [{'Key': k, 'Value': v}
+                     for k, v in sorted((tags or {}).items())]}
+
+
+class _Fleet(object):
+    """Stands in for aws.ec2, serving a dict of instances and volumes and
+    recording the calls made."""
+    def __init__(self):
+        self.instances = {}
+        self.volumes = {}
+        self.calls = []
+
+    @property
+    def ec2(self):
+        return self
+
+    Instances = property(lambda self: _Client(self, self.instances))
+    Volumes = property(lambda self: _Client(self, self.volumes))
+    Tags = property(lambda self: _Client(self, None))
+
+
+class _Client(object):
+    def __init__(self, fleet, items):
+        self.fleet = fleet
+        self.items = items
+
+    def _filtered(self, items, filters):
+        ids = (filters or {}).get('instance-id') or \
+            (filters or {}).get('volume-id')
+        attached = (filters or {}).get('attachment.instance-id')
+        for item in items.values():
+            if ids is not None and \
+                    item.get('InstanceId', item.get('VolumeId')) not in ids:
+                continue
+            if attached is not None and not any(
+                    a['InstanceId'] in attached
+                    for a in item.get('Attachments', ())):
+                continue
+            yield copy.deepcopy(item)
+
+    def get(self, filters=None, stream=False):
+        if 'resource-type' in (filters or {}):
+            self.fleet.calls.append('DescribeTags')
+            return [{'ResourceId': item_id, 'Key': tag['Key'],
+                     'Value': tag['Value']}
+                    for items in (self.fleet.instances, self.fleet.volumes)
+                    for item_id, item in items.items()
+                    for tag in item.get('Tags', ())]
+        if stream:
+            self.fleet.calls.append(('DescribeInstances', filters))
+            return list(self._filtered(self.fleet.instances, filters))
+        self.fleet.calls.append(('DescribeVolumes', filters))
+        return list(self._filtered(self.fleet.volumes, filters))
+
+    def status(self, all_instances=None, stream=False):
+        if self.items is self.fleet.volumes:
+            self.fleet.calls.append('DescribeVolumeStatus')
+            return [{'VolumeId': volume_id} for volume_id in self.items]
+        self.fleet.calls.append('DescribeInstanceStatus')
+        return [{'InstanceId': i['InstanceId'], 'InstanceState': i['State']}
+                for i in self.fleet.instances.values()]
+
+
+class TestEc2Inventory(unittest.TestCase):
+    def setUp(self):
+        self.fleet = _Fleet()
+        for n in range(4):
+            instance = _instance('i-{0}'.format(n), subnet='subnet-{0}'.format(
+                n % 2), tags={'role': 'web' if n < 3 else 'db'})
+            self.fleet.instances[instance['InstanceId']] = instance
+        self.fleet.volumes['vol-1'] = {
+            'VolumeId': 'vol-1', 'State': 'in-use',
+            'Attachments': [{'InstanceId': 'i-0'}]}
+        self.inventory = Ec2Inventory(self.fleet)
+        self.inventory.load()
+
+    def ids(self, items):
+        return sorted(item.get('InstanceId') or item['VolumeId']
+                      for item in items)
+
+    def test_queries(self):
+        inventory = self.inventory
+        self.assertEqual(len(inventory), 4)
+        self.assertEqual(inventory.instance('i-3')['Tags'],
+                         [{'Key': 'role', 'Value': 'db'}])
+        self.assertIsNone(inventory.instance('i-9'))
+        self.assertEqual(self.ids(inventory.instances(tag=('role', 'web'),
+                                                      subnet='subnet-0')),
+                         ['i-0', 'i-2'])
+        self.assertEqual(self.ids(inventory.instances(tag_key='role')),
+                         ['i-0', 'i-1', 'i-2', 'i-3'])
+        self.assertEqual(inventory.instances(state='stopped'), [])
+        self.assertEqual(self.ids(inventory.volumes(instance='i-0')),
+                         ['vol-1'])
+        self.assertRaises(TypeError, inventory.instances, color='red')
+
+    def test_refresh_describes_only_changes(self):
+        fleet = self.fleet
+        fleet.instances['i-1']['State'] = {'Name': 'stopped'}
+        fleet.instances['i-4'] = _instance('i-4')
+        del fleet.instances['i-0']
+        del fleet.volumes['vol-1']
+        fleet.instances['i-2']['Tags'] = [{'Key': 'role', 'Value': 'db'}]
+        fleet.calls = []
+
+        changes = self.inventory.refresh()
+        self.assertEqual(changes, {'added': set(['i-4']),
+                                   'updated': set(['i-1', 'i-2']),
+                                   'removed': set(['i-0'])})
+        described = [filters for call in fleet.calls
+                     if call[0] == 'DescribeInstances'
+                     for filters in call[1:]]
+        self.assertEqual([sorted(f['instance-id']) for f in described],
+                         [['i-1', 'i-4']])
+        inventory = self.inventory
+        self.assertEqual(self.ids(inventory.instances(state='stopped')),
+                         ['i-1'])
+        self.assertEqual(self.ids(inventory.instances(tag=('role', 'db'))),
+                         ['i-2', 'i-3'])
+        self.assertEqual(inventory.volumes(), [])
+        self.assertIsNone(inventory.instance('i-0'))
+
+    def test_refresh_finds_unattached_volumes(self):
+        fleet = self.fleet
+        fleet.volumes['vol-2'] = {'VolumeId': 'vol-2', 'State': 'available',
+                                  'Attachments': []}
+        fleet.calls = []
+        self.inventory.refresh()
+        self.assertEqual(self.ids(self.inventory.volumes()),
+                         ['vol-1', 'vol-2'])
+        self.assertIn(('DescribeVolumes', {'volume-id': ['vol-2']}),
+                      fleet.calls)
+        del fleet.volumes['vol-2']
+        self.inventory.refresh()
+        self.assertEqual(self.ids(self.inventory.volumes()), ['vol-1'])
+
+    def test_full_refresh(self):
+        self.assertEqual(self.inventory.full_refresh, VOLUME_FULL_REFRESH)
+        inventory = Ec2Inventory(self.fleet, volumes=False)
+        self.assertIsNone(inventory.full_refresh)
+
+    def test_refresh_loads_first(self):
+        inventory = Ec2Inventory(self.fleet, volumes=False, tags=False)
+        self.assertEqual(inventory.refresh()['added'],
+                         set(['i-0', 'i-1', 'i-2', 'i-3']))
+        self.assertEqual(inventory.refresh(), {'added': set(),
+                                               'updated': set(),
+                                               'removed': set()})
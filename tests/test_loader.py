@@ -0,0 +1,49 @@
+import unittest
+from acky.loader import BatchLoader
+
+
+class TestBatchLoader(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+
+    def fetch(self, ids):
+        self.requests.append(list(ids))
+        if 'i-bad' in ids:
+            raise ValueError('i-bad')
+        return [{'InstanceId': i} for i in ids if i != 'i-gone']
+
+    def loader(self, **options):
+        return BatchLoader(self.fetch, key=lambda r: r['InstanceId'],
+                           **options)
+
+    def test_batches_within_window(self):
+        loader = self.loader(window=0.05)
+        futures = loader.load_many(['i-1', 'i-2', 'i-1'])
+        self.assertEqual([f.result(1)['InstanceId'] for f in futures],
+                         ['i-1', 'i-2', 'i-1'])
+        self.assertEqual(self.requests, [['i-1', 'i-2']])
+
+    def test_max_batch(self):
+        loader = self.loader(max_batch=2, window=10)
+        futures = loader.load_many(['i-1', 'i-2', 'i-3'])
+        futures[0].result(1)
+        loader.flush()
+        self.assertEqual(futures[2].result(1), {'InstanceId': 'i-3'})
+        self.assertEqual(self.requests, [['i-1', 'i-2'], ['i-3']])
+
+    def test_missing_record(self):
+        loader = self.loader(window=10)
+        future = loader.load('i-gone')
+        loader.flush()
+        self.assertIsNone(future.result(1))
+
+    def test_isolates_failures(self):
+        loader = self.loader(window=10)
+        good, bad = loader.load_many(['i-1', 'i-bad'])
+        loader.flush()
+        self.assertEqual(good.result(1), {'InstanceId': 'i-1'})
+        self.assertRaises(ValueError, bad.result, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
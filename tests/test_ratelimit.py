@@ -0,0 +1,72 @@
+import unittest
+from acky.ratelimit import RateLimiter, TokenBucket
+from tests import _AWS
+try:
+    from unittest.mock import MagicMock
+except ImportError:
+    from mock import MagicMock
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self):
+        clock = _Clock()
+        bucket = TokenBucket(2, burst=3, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            self.assertEqual(bucket.acquire(), 0)
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+
+    def test_refills(self):
+        clock = _Clock()
+        bucket = TokenBucket(1, burst=1, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        clock.now += 5
+        self.assertEqual(bucket.acquire(), 0)
+
+    def test_rejects_bad_rate(self):
+        self.assertRaises(ValueError, TokenBucket, 0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_operation_overrides_service(self):
+        limiter = RateLimiter({'ec2': (20, 40),
+                               ('ec2', 'DescribeInstances'): (5, 10)})
+        self.assertEqual(limiter.bucket('ec2', 'DescribeInstances').rate, 5)
+        self.assertEqual(limiter.bucket('ec2', 'DescribeVolumes').rate, 20)
+        self.assertIsNone(limiter.bucket('sqs', 'SendMessage'))
+
+    def test_buckets_are_shared(self):
+        limiter = RateLimiter(default=(1, 1))
+        self.assertIs(limiter.bucket('ec2', 'DescribeVpcs'),
+                      limiter.bucket('ec2', 'DescribeVpcs'))
+        self.assertIsNot(limiter.bucket('ec2', 'DescribeVpcs'),
+                         limiter.bucket('ec2', 'DescribeSubnets'))
+
+    def test_unlimited(self):
+        self.assertEqual(RateLimiter().acquire('ec2', 'DescribeVpcs'), 0)
+
+    def test_consulted_by_call(self):
+        limiter = MagicMock()
+        client = _AWS(rate_limiter=limiter).ec2.VPCs
+        op = MagicMock()
+        op.call.return_value = (MagicMock(ok=True), {'Vpcs': []})
+        client._operations["DescribeVpcs"] = op
+        client.get()
+        limiter.acquire.assert_called_once_with('ec2', "DescribeVpcs")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import pickle
+import unittest
+import acky.ec2
+from acky.records import InstanceRecord, TagMap, VolumeRecord, tag_map
+from tests import _AWS
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+def _instance(n, tags=None):
+    return {
+        'InstanceId': 'i-{0:08x}'.format(n),
+        'State': {'Code': 16, 'Name': 'running'},
+        'Placement': {'AvailabilityZone': 'us-east-1a', 'Tenancy': 'default'},
+        'BlockDeviceMappings': [{'DeviceName': '/dev/sda1',
+                                 'Ebs': {'VolumeId': 'vol-1',
+                                         'Status': 'attached'}}],
+        'Tags': tags if tags is not None else [
+            {'Key': 'Name', 'Value': 'web'}, {'Key': 'env', 'Value': 'prod'}],
+        'EbsOptimized': False,
+    }
+
+
+class TestRecords(unittest.TestCase):
+    def test_fields(self):
+        record = InstanceRecord(_instance(1))
+        self.assertEqual(record.InstanceId, 'i-00000001')
+        self.assertEqual(record['State'], {'Code': 16, 'Name': 'running'})
+        self.assertEqual(record.BlockDeviceMappings[0]['Ebs']['VolumeId'],
+                         'vol-1')
+        self.assertIs(record.EbsOptimized, False)
+        self.assertIsNone(record.KeyName)
+        self.assertNotIn('KeyName', record)
+        self.assertRaises(KeyError, lambda: record['KeyName'])
+        self.assertEqual(record.get('KeyName', 'none'), 'none')
+
+    def test_round_trip(self):
+        data = _instance(1)
+        data['Unmodelled'] = {'A': [1, 2]}
+        record = InstanceRecord(data)
+        self.assertEqual(record['Unmodelled'], {'A': [1, 2]})
+        self.assertEqual(record.to_dict(), data)
+        self.assertEqual(pickle.loads(pickle.dumps(record)).to_dict(), data)
+
+    def test_tags_are_shared(self):
+        first = InstanceRecord(_instance(1))
+        second = InstanceRecord(_instance(2, tags=[
+            {'Key': 'env', 'Value': 'prod'}, {'Key': 'Name', 'Value': 'web'}]))
+        self.assertIsInstance(first.Tags, TagMap)
+        self.assertEqual(dict(first.Tags), {'Name': 'web', 'env': 'prod'})
+        self.assertIs(first.Tags, second.Tags)
+        self.assertIsNot(first.Tags, tag_map([{'Key': 'Name', 'Value': 'db'}]))
+
+    def test_read_only(self):
+        record = VolumeRecord({'VolumeId': 'vol-1', 'Size': 8})
+        self.assertEqual(dict(record), {'VolumeId': 'vol-1', 'Size': 8})
+        with self.assertRaises(AttributeError):
+            record.Size = 16
+        self.assertFalse(hasattr(record, '__dict__'))
+
+
+class TestCompactGet(unittest.TestCase):
+    @patch('acky.api.AwsApiClient.iter_call')
+    @patch('acky.api.AwsApiClient.call')
+    def test_instances(self, _call, _iter_call):
+        reservations = [{'Instances': [_instance(1), _instance(2)]},
+                        {'Instances': [_instance(3)]}]
+        _call.return_value = reservations
+        _iter_call.return_value = iter(reservations)
+        instances = acky.ec2.InstanceCollection(_AWS())
+
+        records = instances.get(compact=True)
+        self.assertEqual([type(r) for r in records], [InstanceRecord] * 3)
+        self.assertEqual([r.to_dict() for r in records],
+                         [_instance(1), _instance(2), _instance(3)])
+        streamed = instances.get(stream=True, compact=True)
+        self.assertEqual(next(streamed).InstanceId, 'i-00000001')
+        self.assertEqual(len(list(streamed)), 2)
+
+    @patch('acky.api.AwsApiClient.call')
+    def test_empty(self, _call):
+        _call.return_value = None
+        volumes = acky.ec2.VolumeCollection(_AWS())
+        self.assertIsNone(volumes.get(compact=True))
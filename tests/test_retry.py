@@ -0,0 +1,133 @@
+from botocore.vendored.requests import ConnectionError
+import unittest
+import tests
+from acky.api import AWSCallError
+from acky.retry import AdaptiveRate, RetryPolicy, THROTTLE, TRANSIENT
+from tests import _AWS
+from tests.server import StubAWSServer, stubbed
+from tests.stub import ReplayEndpoint, StubResponse
+
+THROTTLE_XML = ("<Response><Errors><Error><Code>RequestLimitExceeded</Code>"
+                "<Message>Request limit exceeded.</Message></Error></Errors>"
+                "<RequestID>abc</RequestID></Response>")
+AUTH_XML = ("<Response><Errors><Error><Code>AuthFailure</Code>"
+            "<Message>Not authorized.</Message></Error></Errors>"
+            "<RequestID>abc</RequestID></Response>")
+
+
+class TestRetry(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.policy = RetryPolicy(max_attempts=3, adaptive=False,
+                                  sleep=self.sleeps.append)
+
+    def _client(self, responses):
+        client = _AWS(retry_policy=self.policy).ec2.VPCs
+        client._endpoint = ReplayEndpoint(responses)
+        return client
+
+    def test_retries_throttling(self):
+        client = self._client([
+            (StubResponse(503, THROTTLE_XML), {}),
+            (StubResponse(503, THROTTLE_XML), {}),
+            (StubResponse(200), {'Vpcs': ['vpc-1']}),
+        ])
+        self.assertEqual(client.get(), ['vpc-1'])
+        self.assertEqual(client._endpoint.requests, 3)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        client = self._client([(StubResponse(503, THROTTLE_XML), {})] * 3)
+        with self.assertRaises(AWSCallError) as raised:
+            client.get()
+        self.assertEqual(raised.exception.code, "RequestLimitExceeded")
+        self.assertEqual(client._endpoint.requests, 3)
+
+    def test_does_not_retry_client_errors(self):
+        client = self._client([(StubResponse(401, AUTH_XML), {})])
+        with self.assertRaises(AWSCallError):
+            client.get()
+        self.assertEqual(client._endpoint.requests, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_classify(self):
+        self.assertEqual(self.policy.classify(400, "Throttling"), THROTTLE)
+        self.assertEqual(self.policy.classify(500, None), TRANSIENT)
+        self.assertEqual(self.policy.classify(400, "InvalidParameter"), None)
+        self.assertEqual(self.policy.classify_exception(ConnectionError()),
+                         TRANSIENT)
+        self.assertEqual(self.policy.classify_exception(ValueError()), None)
+
+    def test_delay_is_capped(self):
+        policy = RetryPolicy(base_delay=1, max_delay=5)
+        for attempt in range(1, 10):
+            self.assertTrue(0 <= policy.delay(attempt) <= 5)
+
+
+class TestRetryOverHTTP(unittest.TestCase):
+    """Retries through a real botocore endpoint, against a local stub."""
+    def setUp(self):
+        self.server = StubAWSServer().start()
+        self.addCleanup(self.server.stop)
+        stub = stubbed(self.server.url)
+        stub.__enter__()
+        self.addCleanup(stub.__exit__, None, None, None)
+        self.sleeps = []
+        # tests/__init__.py replaces acky.aws.AWS with a mock.
+        self.aws = tests.AWS('us-east-1', retry_policy=RetryPolicy(
+            max_attempts=3, sleep=self.sleeps.append))
+
+    def test_only_acky_retries(self):
+        self.server.state.errors = [(503, 'RequestLimitExceeded')] * 10
+        with self.assertRaises(AWSCallError):
+            self.aws.ec2.VPCs.get()
+        self.assertEqual(self.server.state.requests, 3)
+        rate = self.aws.retry_policy.rate('ec2', 'us-east-1')
+        self.assertIsNotNone(rate.rate)
+
+    def test_retries_then_succeeds(self):
+        self.server.state.errors = [(500, 'InternalError')]
+        self.assertEqual(self.aws.ec2.VPCs.get()[0]['VpcId'], 'vpc-00000001')
+        self.assertEqual(self.server.state.requests, 2)
+
+
+class TestAdaptiveRate(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.rate = AdaptiveRate(clock=lambda: self.now,
+                                 sleep=self.sleeps.append)
+
+    def test_unlimited_until_throttled(self):
+        for _ in range(10):
+            self.rate.acquire()
+        self.assertEqual(self.sleeps, [])
+        self.assertIsNone(self.rate.rate)
+
+    def test_backs_off_and_recovers(self):
+        for _ in range(20):
+            self.rate.acquire()
+        self.rate.throttled()
+        self.assertEqual(self.rate.rate, 10)
+        self.rate.acquire()
+        self.rate.acquire()
+        self.assertAlmostEqual(self.sleeps[-1], 0.1)
+        while self.rate.rate is not None:
+            self.rate.succeeded()
+        self.assertIsNone(self.rate.rate)
+
+    def test_cuts_once_per_window(self):
+        for _ in range(20):
+            self.rate.acquire()
+        in_flight = [self.rate.acquire() for _ in range(5)]
+        self.now = 1.0
+        for sent_at in in_flight:
+            self.rate.throttled(sent_at)
+        self.assertEqual(self.rate.rate, 12.5)
+        self.now = 2.0
+        self.rate.throttled(self.rate.acquire())
+        self.assertEqual(self.rate.rate, 6.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import io
+import json
+import logging
+import unittest
+from acky.api import AWSCallError
+from acky.retry import RetryPolicy
+from acky.stats import Histogram, StatsRegistry, json_exporter, log_exporter
+from tests import _AWS
+from tests.stub import ReplayEndpoint, StubResponse
+
+THROTTLE_XML = ("<Response><Errors><Error><Code>RequestLimitExceeded</Code>"
+                "<Message>Request limit exceeded.</Message></Error></Errors>"
+                "<RequestID>abc</RequestID></Response>")
+
+
+def _response(status_code, text=''):
+    return StubResponse(status_code, text, request_body='Action=X')
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        for _ in range(99):
+            histogram.record(0.01)
+        histogram.record(5.0)
+        self.assertAlmostEqual(histogram.percentile(50), 0.01, delta=0.002)
+        self.assertAlmostEqual(histogram.percentile(99), 0.01, delta=0.002)
+        self.assertEqual(histogram.percentile(100), 5.0)
+        self.assertEqual(histogram.max, 5.0)
+
+
+class TestStatsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.stats = StatsRegistry()
+        self.stats.record_call('ec2', 'DescribeVpcs', 0.05, request_bytes=10,
+                               response_bytes=100)
+        self.stats.record_call('ec2', 'DescribeVpcs', 0.05, 'Throttling')
+        self.stats.record_retry('ec2', 'DescribeVpcs')
+
+    def test_snapshot(self):
+        vpcs = self.stats.snapshot()['ec2']['DescribeVpcs']
+        self.assertEqual(vpcs['calls'], 2)
+        self.assertEqual(vpcs['errors'], {'Throttling': 1})
+        self.assertEqual(vpcs['retries'], 1)
+        self.assertEqual(vpcs['request_bytes'], 10)
+        self.assertEqual(vpcs['response_bytes'], 100)
+        self.assertAlmostEqual(vpcs['latency']['mean'], 0.05)
+        self.assertIsNone(self.stats.get('ec2', 'DescribeImages'))
+
+    def test_exporters(self):
+        stream = io.StringIO()
+        records = []
+        logger = logging.getLogger('test_stats')
+        logger.addHandler(_ListHandler(records))
+        logger.setLevel(logging.INFO)
+        self.stats.add_exporter(json_exporter(stream))
+        self.stats.add_exporter(log_exporter(logger))
+        snapshot = self.stats.export()
+        self.assertEqual(json.loads(stream.getvalue()),
+                         json.loads(json.dumps(snapshot)))
+        self.assertIn("ec2.DescribeVpcs calls=2 errors=1 retries=1",
+                      records[0].getMessage())
+
+    def test_reset(self):
+        self.stats.reset()
+        self.assertEqual(self.stats.snapshot(), {})
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self, records):
+        super(_ListHandler, self).__init__()
+        self.records = records
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestCallStats(unittest.TestCase):
+    def setUp(self):
+        self.stats = StatsRegistry()
+
+    def _client(self, responses):
+        policy = RetryPolicy(max_attempts=2, adaptive=False,
+                             sleep=lambda seconds: None)
+        client = _AWS(retry_policy=policy, stats=self.stats).ec2.VPCs
+        client._endpoint = ReplayEndpoint(responses)
+        return client
+
+    def test_records_success_after_retry(self):
+        client = self._client([
+            (_response(503, THROTTLE_XML), {}),
+            (_response(200, '<Vpcs/>'), {'Vpcs': []}),
+        ])
+        client.get()
+        vpcs = self.stats.get('ec2', 'DescribeVpcs')
+        self.assertEqual(vpcs['calls'], 1)
+        self.assertEqual(vpcs['retries'], 1)
+        self.assertEqual(vpcs['errors'], {})
+        self.assertEqual(vpcs['request_bytes'], 16)
+        self.assertEqual(vpcs['response_bytes'], len(THROTTLE_XML) + 7)
+
+    def test_records_error_code(self):
+        client = self._client([(_response(503, THROTTLE_XML), {})] * 2)
+        with self.assertRaises(AWSCallError):
+            client.get()
+        vpcs = self.stats.get('ec2', 'DescribeVpcs')
+        self.assertEqual(vpcs['errors'], {'RequestLimitExceeded': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
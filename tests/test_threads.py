@@ -0,0 +1,69 @@
+"""Stress test: one AWS object shared by a thread pool, calling a local
+stub of EC2 and SQS."""
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+import tests
+from acky.cache import ResponseCache
+from acky.stats import StatsRegistry
+from tests.server import StubAWSServer, stubbed
+
+# tests/__init__.py replaces acky.aws.AWS with a mock; it keeps the real one.
+AWS = tests.AWS
+
+THREADS = 16
+ROUNDS = 10
+INSTANCES = 30
+
+
+class TestSharedAWS(unittest.TestCase):
+    def setUp(self):
+        self.server = StubAWSServer(instances=INSTANCES).start()
+        self.stub = stubbed(self.server.url)
+        self.stub.__enter__()
+
+    def tearDown(self):
+        self.stub.__exit__(None, None, None)
+        self.server.stop()
+
+    def _work(self, aws, queue, n):
+        for _ in range(ROUNDS):
+            self.assertEqual(aws.ec2.VPCs.get()[0]['VpcId'], 'vpc-00000001')
+            instances = list(aws.ec2.Instances.get(stream=True))
+            self.assertEqual(len(instances), INSTANCES)
+            aws.sqs.Messages.create(queue, 'message {0}'.format(n))
+        return n
+
+    def _run(self, aws):
+        queue = aws.sqs.Queues.create('stress')
+        pool = ThreadPoolExecutor(max_workers=THREADS)
+        try:
+            results = list(pool.map(lambda n: self._work(aws, queue, n),
+                                    range(THREADS)))
+        finally:
+            pool.shutdown()
+        self.assertEqual(results, list(range(THREADS)))
+        received = 0
+        while True:
+            messages = aws.sqs.Messages.get(queue) or []
+            if not messages:
+                break
+            received += len(messages)
+        self.assertEqual(received, THREADS * ROUNDS)
+
+    def test_concurrent_calls(self):
+        stats = StatsRegistry()
+        aws = AWS('us-east-1', coalesce=False, stats=stats)
+        self._run(aws)
+        sent = stats.get('sqs', 'SendMessage')
+        self.assertEqual(sent['calls'], THREADS * ROUNDS)
+        self.assertEqual(sent['errors'], {})
+        self.assertEqual(stats.get('ec2', 'DescribeVpcs')['calls'],
+                         THREADS * ROUNDS)
+
+    def test_concurrent_shared_reads(self):
+        aws = AWS('us-east-1', response_cache=ResponseCache(ttl=0.01))
+        self._run(aws)
+
+
+if __name__ == '__main__':
+    unittest.main()
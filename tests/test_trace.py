@@ -0,0 +1,86 @@
+import io
+import json
+import unittest
+from acky.api import AWSCallError
+from acky.retry import RetryPolicy
+from acky.trace import Tracer, redact
+from tests import _AWS
+from tests.stub import ReplayEndpoint, StubResponse
+
+THROTTLE_XML = ("<Response><Errors><Error><Code>RequestLimitExceeded</Code>"
+                "<Message>Request limit exceeded.</Message></Error></Errors>"
+                "<RequestID>abc</RequestID></Response>")
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        policy = RetryPolicy(max_attempts=2, adaptive=False,
+                             sleep=lambda seconds: None)
+        self.aws = _AWS(retry_policy=policy, tracer=Tracer())
+
+    def _instances(self, responses):
+        client = self.aws.ec2.Instances
+        client._endpoint = ReplayEndpoint(responses)
+        return client
+
+    def test_records_call_tree(self):
+        client = self._instances([(StubResponse(200), {'return': 'true'})] * 2)
+        with self.aws.tracer.trace() as trace:
+            client.control(['i-1', 'i-2'], 'protect')
+        root, = trace.roots
+        self.assertEqual(root.name, 'InstanceCollection.control')
+        self.assertEqual(root.outcome, 'ok')
+        self.assertEqual([span.name for span in root.children],
+                         ['ModifyInstanceAttribute'] * 2)
+        # control() protects the instances on a thread pool.
+        self.assertEqual(sorted(span.args['params']['InstanceId']
+                                for span in root.children), ['i-1', 'i-2'])
+        self.assertEqual(len(trace.spans), 3)
+        for span in root.children:
+            self.assertTrue(root.start <= span.start)
+            self.assertTrue(span.end <= root.end)
+
+    def test_records_errors_and_retries(self):
+        client = self._instances([(StubResponse(503, THROTTLE_XML), {})] * 2)
+        with self.aws.tracer.trace() as trace:
+            with self.assertRaises(AWSCallError):
+                client.status()
+        span, = trace.spans
+        self.assertEqual(span.outcome, 'RequestLimitExceeded')
+        self.assertEqual([event[1] for event in span.events], ['retry'])
+
+    def test_inactive_outside_block(self):
+        client = self._instances([(StubResponse(200), {'return': 'true'})])
+        with self.aws.tracer.trace() as trace:
+            pass
+        client.control('i-1', 'protect')
+        self.assertEqual(trace.spans, [])
+        self.assertFalse(self.aws.tracer.active)
+
+    def test_chrome_trace(self):
+        client = self._instances([(StubResponse(200), {'return': 'true'})])
+        with self.aws.tracer.trace() as trace:
+            client.control('i-1', 'protect')
+        fp = io.StringIO()
+        trace.dump(fp)
+        events = json.loads(fp.getvalue())['traceEvents']
+        self.assertEqual([e['name'] for e in events],
+                         ['InstanceCollection.control',
+                          'ModifyInstanceAttribute'])
+        self.assertEqual(events[1]['ph'], 'X')
+        self.assertEqual(events[1]['cat'], 'ec2')
+        self.assertEqual(events[1]['args']['outcome'], 'ok')
+
+    def test_redact(self):
+        params = redact({'MasterUserPassword': 'hunter2',
+                         'UserData': 'c2VjcmV0',
+                         'body': io.BytesIO(b'data'),
+                         'Filters': [{'Name': 'tag:Name', 'Values': ['x']}]})
+        self.assertEqual(params['MasterUserPassword'], '<redacted>')
+        self.assertEqual(params['UserData'], '<redacted>')
+        self.assertEqual(params['body'], '<BytesIO>')
+        self.assertEqual(params['Filters'][0]['Values'], ['x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
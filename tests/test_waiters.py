@@ -0,0 +1,95 @@
+import unittest
+import acky.ec2
+from acky.waiters import WaitFailed, Waiter, WaitTimeout
+from tests import _AWS
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestWaiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        # Each resource's states over successive polls; the last repeats.
+        self.states = {}
+        self.calls = []
+
+    def describe(self, ids):
+        self.calls.append(list(ids))
+        poll = len(self.clock.sleeps)
+        return [{'Id': i,
+                 'State': self.states[i][min(poll, len(self.states[i]) - 1)]}
+                for i in ids if self.states.get(i)]
+
+    def waiter(self, **options):
+        return Waiter(self.describe, 'Id', lambda item: item['State'], 'done',
+                      failures=('error',), clock=self.clock,
+                      sleep=self.clock.sleep, **options)
+
+    def test_polls_pending_ids_in_batches(self):
+        self.states = {'a': ['done'], 'b': ['busy', 'done'],
+                       'c': ['busy', 'busy', 'error'],
+                       'd': [None, 'busy', 'done']}
+        finished = []
+        waiter = self.waiter(batch_size=2,
+                             callback=lambda *args: finished.append(args))
+        results = waiter.wait(['a', 'b', 'c', 'd', 'a'])
+        self.assertEqual(sorted(results), ['a', 'b', 'd'])
+        self.assertIsInstance(results.errors['c'], WaitFailed)
+        self.assertEqual(results.errors['c'].state, 'error')
+        self.assertEqual(self.calls, [['a', 'b'], ['c', 'd'], ['b', 'c'],
+                                      ['d'], ['c', 'd']])
+        self.assertEqual(waiter.polls, 3)
+        self.assertEqual([f[0] for f in finished], ['a', 'b', 'c', 'd'])
+        self.assertIsNone(finished[0][2])
+
+    def test_interval_backs_off_without_progress(self):
+        self.states = {'a': ['busy'] * 5 + ['done'], 'b': ['busy']}
+        results = self.waiter(interval=1, max_interval=3, backoff=2,
+                              timeout=20).wait(['a', 'b'])
+        self.assertEqual(self.clock.sleeps, [2, 3, 3, 3, 3, 1, 2, 3])
+        self.assertEqual(list(results), ['a'])
+        self.assertIsInstance(results.errors['b'], WaitTimeout)
+
+    def test_futures(self):
+        self.states = {'a': ['done'], 'b': ['error']}
+        futures = self.waiter().start(['a', 'b'])
+        self.assertEqual(futures['a'].result(1), {'Id': 'a', 'State': 'done'})
+        self.assertRaises(WaitFailed, futures['b'].result, 1)
+
+
+class TestCollectionWaiters(unittest.TestCase):
+    @patch('acky.api.AwsApiClient.iter_call')
+    def test_wait_until_running(self, _iter_call):
+        _iter_call.side_effect = [
+            iter([{'Instances': [
+                {'InstanceId': 'i-1', 'State': {'Name': 'running'}},
+                {'InstanceId': 'i-2', 'State': {'Name': 'terminated'}},
+                {'InstanceId': 'i-3', 'State': {'Name': 'stopped'}}]}]),
+            iter([{'Instances': [
+                {'InstanceId': 'i-3', 'State': {'Name': 'running'}}]}])]
+        instances = acky.ec2.InstanceCollection(_AWS())
+        results = instances.wait_until_running(['i-1', 'i-2', 'i-3'],
+                                               interval=0)
+        self.assertEqual(sorted(results), ['i-1', 'i-3'])
+        self.assertEqual(list(results.errors), ['i-2'])
+        first, second = _iter_call.call_args_list
+        self.assertEqual(first[1]['filters'], [
+            {'Name': 'instance-id', 'Values': ['i-1', 'i-2', 'i-3']}])
+        self.assertEqual(second[1]['filters'], [
+            {'Name': 'instance-id', 'Values': ['i-3']}])
+        self.assertIs(second[1]['cache'], False)